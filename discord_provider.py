@@ -1,17 +1,47 @@
+import asyncio
+import itertools
 import logging
+import re
+from collections import OrderedDict
 from typing import Optional
 
+import aiohttp
 import discord
 from discord import app_commands
 
 import front_end_utils
+import rate_limiter
 import settings_handler
-import json
-import requests
+import orjson
 import provider
-import discord.app_commands
 
 
+# The generation settings that cannot be passed through a slash command, as they are lists of tokenized words. These are
+# carried over from the current settings instead.
+PRESERVED_GENERATION_ARGS = ("bad_words_ids", "forced_words_ids")
+# How many fetched messages that were replied to are kept around, so the same message isn't fetched over and over.
+REFERENCED_MESSAGE_CACHE_SIZE = 256
+# What to tell the user for each of request_generation's error codes. Any other code is an HTTP status code.
+GENERATION_ERROR_MESSAGES = {
+    0: "There was a timeout error during generation. Please check the console error logs.",
+    -1: "There was a request error during generation. Please check the console error logs.",
+    -2: "There was a generic error during generation. Please check the console error logs.",
+    -3: "There was an http error during generation without a status code. Please check the console error logs."
+}
+# The two kinds of experimental settings the backend accepts.
+EXPERIMENTAL_ARG_KEYS = ("experimental_warpers", "experimental_processors")
+
+
+def make_empty_experimental_args():
+    """
+    Makes a fresh set of experimental settings with nothing in them, to be filled in by a slash command.
+    A new dict is made each call, so that no two commands ever end up sharing (and mutating) the same one.
+
+    :return: The experimental settings, with each kind of experimental setting empty.
+    :rtype: dict
+    """
+    return {key: {} for key in EXPERIMENTAL_ARG_KEYS}
+
 
 class Discord_Provider(discord.Client, provider.Provider):
     """
@@ -34,32 +64,73 @@ class Discord_Provider(discord.Client, provider.Provider):
         provider.Provider.__init__(self=self, a_settings_handler=a_settings_handler)
 
         self.discord_provider_settings = a_settings_handler.settings['provider_settings']
+        # What's appended to the chat history before every bot response, tokenized just the once as it never changes.
+        self.bot_prompt = f"{self.bot_name}:"
+        self.bot_prompt_token_ids = self.memories.tokenize_message(self.bot_prompt, self.tokenizer)
         # necessary setting, cannot log bot into Discord without token.
         self.token = self.discord_provider_settings['token']
-        self.bot_nicknames = self.discord_provider_settings['bot_nicknames']
-
-        self.status_type = self.discord_provider_settings[
-            'status_type'] if 'status_type' in self.discord_provider_settings.keys() else None
-        self.status_body = self.discord_provider_settings[
-            'status_body'] if 'status_body' in self.discord_provider_settings.keys() else None
+        # Lowercased once here so that nicknames are matched regardless of case.
+        self.bot_nicknames = frozenset(nickname.lower() for nickname in
+                                       self.discord_provider_settings.get('bot_nicknames', ()))
+        # All the nicknames joined into one pattern, so a message is scanned once rather than once per nickname.
+        self.nickname_regex = re.compile("|".join(re.escape(nickname) for nickname in self.bot_nicknames),
+                                         re.IGNORECASE) if self.bot_nicknames else None
+
+        self.status_type = self.discord_provider_settings.get('status_type')
+        self.status_body = self.discord_provider_settings.get('status_body')
         # Aka the discord server the bot will be used the most in. Needed for bot command syncing.
-        self.main_guild_id = self.discord_provider_settings[
-            'main_guild_id'] if 'main_guild_id' in self.discord_provider_settings.keys() else None
+        self.main_guild_id = self.discord_provider_settings.get('main_guild_id')
+        # Made once and shared by all the slash commands. If there's no main guild, the commands are global instead.
+        self.main_guild = discord.Object(self.main_guild_id) if self.main_guild_id else None
         # Aka a way to send messages 'impersonating' a user. Will be updated such that this won't be necessary
         # eventually.
-        self.webhook_url = self.discord_provider_settings[
-            'webhook_url'] if 'webhook_url' in self.discord_provider_settings.keys() else None
+        self.webhook_url = self.discord_provider_settings.get('webhook_url')
         # Aka if the bot always responds, regardless of what is typed. This does not apply to system messages, however.
         # Discord bots can never reply to system messages.
-        self.conditional_response = self.discord_provider_settings[
-            'conditional_response'] if 'conditional_response' in self.discord_provider_settings.keys() and \
-                                       self.discord_provider_settings[
-                                           'conditional_response'] is True else False
+        self.conditional_response = bool(self.discord_provider_settings.get('conditional_response', False))
+        # Long-lived HTTP session for webhook requests. Its connection pool keeps connections to Discord alive between
+        # requests, so only the first webhook message pays for the TCP and TLS handshakes. Can only be made once there's
+        # a running event loop, so it's actually created in setup_hook.
+        self.http_session = None
+        # One rate limiting bucket per webhook url, as Discord rate limits each webhook separately.
+        self.webhook_buckets = {}
+        # The url of the Netherworld Webhook of each channel, keyed by channel id, so Discord is only asked for the
+        # channel's webhooks the first time autocomplete is used in it.
+        self.webhook_cache = {}
+        # The bot's most recent reply, as long as nothing else has been sent in its channel since. Lets regenerate
+        # skip asking Discord for the channel history.
+        self.last_bot_message = None
+        # Messages that were replied to, but that Discord didn't have cached, keyed by channel id and message id. Kept in
+        # least recently used order, so the oldest can be dropped once there's too many.
+        self.referenced_message_cache = OrderedDict()
+        # The bot's own user id. Only known once connected, so it's set in on_ready.
+        self.bot_id = None
 
         # Initializes all slash commands such that they can be used in what the user defined their server as.
         self.tree = app_commands.CommandTree(self)
         self.assign_slash_commands()
 
+    async def setup_hook(self):
+        """
+        An override of the setup_hook function from discord.Client. Called once after logging in, but before
+        connecting to the websocket.
+
+        :description: Creates the aiohttp session used for webhook requests. This is done here instead of the ctor as
+        aiohttp sessions need a running event loop, which only exists after the client starts.
+        """
+        self.http_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit_per_host=64, keepalive_timeout=75))
+
+    async def close(self):
+        """
+        An override of the close function from discord.Client. Closes the webhook and backend HTTP sessions alongside
+        the connection to Discord.
+        """
+        if self.http_session is not None:
+            await self.http_session.close()
+        self.backend_session.close()
+        await discord.Client.close(self)
+
     async def get_or_create_webhook(self, a_interaction: discord.Interaction):
         """
         Gets a pre-existing web-hook from the discord server's channel that the bot is in, or makes a new one
@@ -72,12 +143,73 @@ class Discord_Provider(discord.Client, provider.Provider):
         :rtype: str
         """
         channel = a_interaction.channel
+        if channel.id in self.webhook_cache:
+            return self.webhook_cache[channel.id]
+        webhook_url = None
         webhooks = await channel.webhooks()
         for webhook in webhooks:
             if webhook.name == "Netherworld Webhook":
-                return webhook.url
-        new_webhook = await channel.create_webhook(name="Netherworld Webhook")
-        return new_webhook.url
+                webhook_url = webhook.url
+                break
+        if webhook_url is None:
+            new_webhook = await channel.create_webhook(name="Netherworld Webhook")
+            webhook_url = new_webhook.url
+        self.webhook_cache[channel.id] = webhook_url
+        return webhook_url
+
+    async def send_webhook_payload(self, a_webhook_url: str, a_payload: bytes):
+        """
+        Sends a json payload to a webhook through the bot's pooled HTTP session.
+
+        :param a_webhook_url: The url of the webhook to send the payload to.
+        :type a_webhook_url: str
+        :param a_payload: The serialized json payload, i.e. the content, username, and avatar of the message.
+        :type a_payload: bytes
+        :return: The HTTP status code of the webhook's response. 204 means the message was sent.
+        :rtype: int
+        """
+        bucket = self.webhook_buckets.get(a_webhook_url)
+        if bucket is None:
+            bucket = rate_limiter.Token_Bucket()
+            self.webhook_buckets[a_webhook_url] = bucket
+        # Wait our turn rather than get a 429 from Discord and have to try again.
+        await bucket.acquire()
+        async with self.http_session.post(a_webhook_url, data=a_payload,
+                                          headers={"Content-Type": "application/json"}) as response:
+            bucket.update_from_headers(response.headers)
+            return response.status
+
+    def serialize_chat_history_token_ids(self, a_token_ids, a_include_experimental_settings: bool = True):
+        """
+        Encodes the token ids of the chat history and serializes them alongside the serial settings.
+
+        :description: Encodes the token ids of the chat history into base64 and serializes them alongside the
+        serial settings. This is the heaviest bit of work done before sending a request, as long chat histories can
+        have tens of thousands of tokens, so it's meant to be run in another thread.
+        :param a_token_ids: The token ids of the chat history.
+        :type a_token_ids: [int]
+        :param a_include_experimental_settings: Whether to include the experimental settings.
+        :type a_include_experimental_settings: bool
+        :return: The serial settings in json string form.
+        :rtype: str
+        """
+        chat_history = front_end_utils.get_encoded_str_from_token_list(a_token_ids)
+        return self.serialize_settings(chat_history, a_include_experimental_settings)
+
+    def build_generation_args(self, **a_generation_args):
+        """
+        Builds the generation settings for a slash command out of the passed settings.
+
+        :description: The settings in PRESERVED_GENERATION_ARGS are copied over from the current generation settings
+        (or set to None if they don't exist), as there is no way of passing them through a slash command.
+        :param a_generation_args: The generation settings passed through the slash command.
+        :return: The generation settings, now including the preserved settings.
+        :rtype: dict
+        """
+        generation_args = dict(a_generation_args)
+        for preserved_arg in PRESERVED_GENERATION_ARGS:
+            generation_args[preserved_arg] = self.generation_args.get(preserved_arg)
+        return generation_args
 
     def assign_slash_commands(self):
         """
@@ -86,91 +218,20 @@ class Discord_Provider(discord.Client, provider.Provider):
 
         :description: This function is in essence, a compromise between dealing with decorators and events. This is
         mostly as in my attempts to using decorators with OOP, it doesn't work well except when I use a function
-        to act as a proxy. Hence, this function is hilariously long, but only due to the nature of the
-
+        to act as a proxy. Hence, the functions here only declare the slash commands and their parameters, and pass
+        them along to the methods that actually do the work (the ones ending in _command).
         """
 
         @self.tree.command(name="autocomplete", description="Predict what you'll say next!",
-                           guild=discord.Object(self.main_guild_id))
+                           guild=self.main_guild)
         async def autocomplete(a_interaction: discord.Interaction):
             """
-            name - autocomplete - Attempts to predict what the user will say next and sends said prediction via
-            webhook.
-
-            description: The associated function for a slash command of the same name.
-            This function attempts to predict what the user will say next by appending their username into
-            the chat history and letting the bot fill in the rest. The function utilizes a
-            web hook defined in settings (soon to be removed in favor of just creating webhooks on the fly).
-            Note that this function will not work if the setting is invalid. Here is the algorithm -
-
-            1. Defer the response to let discord wait for a response.
-            2. Append the username of whoever used the command.
-            3. Encode the chat history into base64.
-            4. Remove experimental settings for autocompletion, as we're trying to mimic ourselves, not the bot.
-               For example, let's say we're trying to get our bot to speak with a certain puncutation mark in mind to
-               appear frequently(via logit biases).
-               We do not want that same frequency to appear in predicting the user's speech.
-            5. Serialize the settings and re-add the experimental settings.
-            6. Send a request with the serialized settings excluding the experimental settings.
-            7. If our generation is valid, decode and detokenize our message retrieved from the server response.
-            8. Remove the autocompleted message from the memory, as otherwise, this message will appear twice in the
-               text conversation with the way the bot is set up.
-            9. Prepare the webhook payload. This will be our means of impersonating the user, as we can get their
-               username and avatar via the fact they used the command.
-            10. Send over the payload and check the response, sending a mesage if there are any errors.
-
-            :param a_interaction: The interaction which sprung from the user using a slash command. This will help
-            extract the user's username, avatar, to mimic them using a webhook.
-            :type a_interaction: discord.Interaction
+            Proxy for autocomplete_command, see there for details.
             """
-            # Necessary so as not to show that on the client it won't say "application did not respond."
-            await a_interaction.response.defer()
-
-            # Appends the username of whoever sent the command. This is necessary to tell the model "guess what
-            # this user will say next."
-            user_name = a_interaction.user.name
-            self.memories.append_message(user_name + ":", a_tokenizer=self.tokenizer)
-
-            # Preparation of the data to send over through the request.
-            self.serial_settings['chat_history'] = self.memories.get_encoded_chat_history(a_tokenizer=self.tokenizer)
-            # Necessary to avoid certain logit biased puncutation/tokens appearing in the user's predicted speech.
-            experimental_settings_temp_removed = self.serial_settings.pop('experimental_settings')
-            serial_settings = json.dumps(self.serial_settings)
-            self.serial_settings['experimental_settings'] = experimental_settings_temp_removed
-
-            # Send over serialized settings for text generation, and decode the generated message.
-            bot_response = self.request_generation(serial_settings)
-
-            if await self.validate_generation(bot_response, a_interaction=a_interaction):
-                decoded_bot_message = front_end_utils.decode_encoded_tokenized_tensor(bot_response)
-                detokenized_bot_message = self.detokenize_decoded_message(decoded_bot_message)
-
-                # Necessary so this message does not appear twice in our chat history.
-                if len(self.memories.chat_history) > 1:
-                    self.memories.pop_memory()
+            await self.autocomplete_command(a_interaction)
 
-                # Since the interaction has the user's username and avatar, we can use it to simulate their appearance
-                # via webhook, though webhooks work like tiny servers which we can respond to, we will need to set a
-                # json payload.
-                web_hook_payload = {
-                    "content": detokenized_bot_message,
-                    "username": user_name,
-                    "avatar_url": a_interaction.user.avatar.url
-                }
-                stringified_payload = json.dumps(web_hook_payload)
-                webhook_url = await self.get_or_create_webhook(a_interaction)
-                response = requests.post(webhook_url, data=stringified_payload,
-                                         headers={"Content-Type": "application/json"})
-                if response.status_code == 204:
-                    # Clears the message such that it's empty. We only need the webhook's message which is sent seperately,
-                    # so we delete the message on command.
-                    await a_interaction.delete_original_response()
-                else:
-                    logging.error("The request to the webhook failed.")
-                    await a_interaction.followup.send(f"There was an error, please check the console output. "
-                                                      f"Status code: {response.status_code}")
         @self.tree.command(name="change_settings", description="Temporarily change settings.",
-                           guild=discord.Object(self.main_guild_id))
+                           guild=self.main_guild)
         @app_commands.describe(
             do_sample="Whether to allow stochastic and multinomial sampling. Necessary for many params.",
             max_length="The maximum allowed amount of tokens.",
@@ -197,104 +258,18 @@ class Discord_Provider(discord.Client, provider.Provider):
                                   short_word_to_bias: str = None, word_bias_threshold: float = None,
                                   max_time: float = None):
             """
-            Changes the settings of the Discord_Provider Class Temporarily. No Changes are saved after shutdown.
-
-            :description: In essence, this function is a way to change settings on the fly. Don't like how your bot is
-            generating text? Well, this is an easy way to experiment solutions. A few caveats are the fact that the same
-            restrictions apply from the generation command, namely, you can only bias one word at a time since discord
-            does not have native list support for slash commands.
-
-            :algorithm: 1. Defer the response so as let Discord know to wait for a response.
-            2. Update the class body member's generation settings to match the ones passed through this command.
-            3. Create the experimental_settings key.
-            4. Create the experimental_warpers key within experimental_settings if top_a or tfs are passed.
-            5. Create the experimental_processors key within experimental_settings if short_word_to_bias and word_bias_threshold
-            are passed.
-            6. Update both the generation and experimental serial settings.
-
-            :param a_interaction: The interaction which sprung from the user using a slash command. In this case,
-            helps us get all the parameters for the command to generate text.
-            :type a_interaction: discord.Interaction
-            :param prompt: The prompt the model should generate text based off of.
-            :type prompt: str
-            :param do_sample: Whether to allow stochastic and multinominal sampling. Necessary for many params.
-            :type do_sample: bool
-            :param max_length: The maximum allowed amount of tokens
-            :type max_length: float
-            :param temperature: A sampler that makes values more randomly distributed at higher temperatures. (>=0.0)
-            :type temperature: float
-            :param top_k: A sampler that allows you to sample from the best of k tokens (>=0)
-            :type top_k: int
-            :param top_p: A sampler which only takes the tokens whose probabilities add up to top_p or higher. (0.0-1.0)
-            :type top_p: float
-            :param penalty_alpha: The hyperparameter alpha for contrastive search. A higher value penalizes homogenous results. (0.0-1.0)
-            :type penalty_alpha: float
-            :param repetition_penalty:  A sampler which penalizes repetitive tokens. (>=1.0)
-            :type repetition_penalty: float
-            :param typical_p: Samples similar to typical sampling in statistics. (0.0-1.0)
-            :type typical_p: float
-            :param eos_token_id: The id of the token the model should end a sentence with.
-            :type eos_token_id: int
-            :param pad_token_id: The id of the token to pad empty spaces in a sentence with.
-            :type pad_token_id: int
-            :param min_length: The minimum number of tokens to be generated.
-            :type min_length: int
-            :param top_a: Similar to top_p, albeit squares the probability times the threshold. (0.0-1.0)
-            :type top_a: float
-            :param tfs: A complicated sampler. Increase creativity at expense of coherency. (0.0-1.0)
-            :type tfs: float
-            :param short_word_to_bias: Used with word_bias_threshold. The (singular) token to be biased.
-            :type short_word_to_bias: str
-            :param word_bias_threshold: Used with short_word_to_bias. The (float) threshold with which to bias a token.
-            :type word_bias_threshold: float
-            :param max_time: The maximum amount of time the model can use for generation.
-            :type max_time: float
+            Proxy for change_settings_command, see there for details.
             """
-            # Necessary so as not to show that on the client it won't say "application did not respond."
-            await a_interaction.response.defer()
-
-            self.generation_args = {
-                "max_length": max_length,
-                "eos_token_id": eos_token_id,
-                "pad_token_id": pad_token_id,
-                "top_k": top_k,
-                "top_p": top_p,
-                "penalty_alpha": penalty_alpha,
-                "temperature": temperature,
-                "repetition_penalty": repetition_penalty,
-                "typical_p": typical_p,
-                "min_length": min_length,
-                "max_time": max_time,
-                "do_sample": do_sample,
-                "bad_words_ids": self.generation_args[
-                    'bad_words_ids'] if 'bad_words_ids' in self.generation_args.keys() else None,
-                "forced_words_ids": self.generation_args[
-                    'forced_words_ids'] if 'forced_words_ids' in self.generation_args.keys() else None
-            }
-
-            self.experimental_args = {
-                "experimental_warpers": {
-                },
-                "experimental_processors": {
-                }
-            }
-            self.memories.max_length = max_length
-            if tfs is not None:
-                self.experimental_args['experimental_warpers']['tfs'] = tfs
-            if top_a is not None:
-                self.experimental_args['experimental_warpers']['top_a'] = top_a
-            if short_word_to_bias is not None and word_bias_threshold is not None:
-                # The doubly nested list is necessary as JSON cannot serialize tuples.
-                self.experimental_args['experimental_processors']["logit_bias"] = [
-                    [self.tokenize_single_token(short_word_to_bias), word_bias_threshold]]
-            # Finally, update the serializable version of the settings. This is only pertinent to the discord provider.
-            self.serial_settings['experimental_settings'] = self.experimental_args
-            self.serial_settings['generation_settings'] = self.generation_args
-
-            await a_interaction.followup.send("Successfully changed temporary settings.")
+            await self.change_settings_command(a_interaction, do_sample=do_sample, max_length=max_length,
+                                               temperature=temperature, top_k=top_k, top_p=top_p,
+                                               penalty_alpha=penalty_alpha, repetition_penalty=repetition_penalty,
+                                               typical_p=typical_p, eos_token_id=eos_token_id,
+                                               pad_token_id=pad_token_id, min_length=min_length, top_a=top_a, tfs=tfs,
+                                               short_word_to_bias=short_word_to_bias,
+                                               word_bias_threshold=word_bias_threshold, max_time=max_time)
 
         @self.tree.command(name="generate", description="Generate text given a prompt!",
-                           guild=discord.Object(self.main_guild_id))
+                           guild=self.main_guild)
         @app_commands.describe(
         prompt = "The writing prompt for the bot.",
         do_sample = "Whether to allow stochastic and multinomial sampling. Necessary for many params.",
@@ -321,200 +296,401 @@ class Discord_Provider(discord.Client, provider.Provider):
                              pad_token_id: int = 50256, min_length: int = None, top_a: float = None, tfs: float = None,
                              short_word_to_bias: str = None, word_bias_threshold: float = None, max_time: float = None):
             """
-            A function that allows the user to bypass settings as well as memories and directly send text generation
-            settings to the server.
-
-            :description: This function which responds to a discord slash command of the same name, the generate
-            function is quite odd in that it allows the user to bypass any and all pre-defined settings and
-            simply ping the server with their own parameters. As a result, this function has quite an amazing amount
-            of parameters. Note that none of these generations will be saved in chat history.
-            In addition, this was primarily added for a second use case of the models - text generation. Typically,
-            GPT models are finetuned on conversations but their base models are trained for text generation. Hence,
-            it'd be a shame not to use this feature.
-
-            :algorithm: 1. Defer the response so as let Discord know to wait for a response.
-            2. Encode the prompt that was passed.
-            3. Prepare both the generation and experimental settings.
-            4. Create a generation payload with the generation settings and experimental settings, and serializes it.
-            5. Send a response to the server using said payload.
-            6. Validate the response. If valid, receive and decode the response.
-            7. Send the decoded message back through the bot.
-
-            :param a_interaction: The interaction which sprung from the user using a slash command. In this case,
-            helps us get all the parameters for the command to generate text.
-            :type a_interaction: discord.Interaction
-            :param prompt: The prompt the model should generate text based off of.
-            :type prompt: str
-            :param do_sample: Whether to allow stochastic and multinominal sampling. Necessary for many params.
-            :type do_sample: bool
-            :param max_new_tokens: The amount of tokens in integers to generate.
-            :type max_new_tokens: float
-            :param temperature: A sampler that makes values more randomly distributed at higher temperatures. (>=0.0)
-            :type temperature: float
-            :param top_k: A sampler that allows you to sample from the best of k tokens (>=0)
-            :type top_k: int
-            :param top_p: A sampler which only takes the tokens whose probabilities add up to top_p or higher. (0.0-1.0)
-            :type top_p: float
-            :param penalty_alpha: The hyperparameter alpha for contrastive search. A higher value penalizes homogenous results. (0.0-1.0)
-            :type penalty_alpha: float
-            :param repetition_penalty:  A sampler which penalizes repetitive tokens. (>=1.0)
-            :type repetition_penalty: float
-            :param typical_p: Samples similar to typical sampling in statistics. (0.0-1.0)
-            :type typical_p: float
-            :param eos_token_id: The id of the token the model should end a sentence with.
-            :type eos_token_id: int
-            :param pad_token_id: The id of the token to pad empty spaces in a sentence with.
-            :type pad_token_id: int
-            :param min_length: The minimum number of tokens to be generated.
-            :type min_length: int
-            :param top_a: Similar to top_p, albeit squares the probability times the threshold. (0.0-1.0)
-            :type top_a: float
-            :param tfs: A complicated sampler. Increase creativity at expense of coherency. (0.0-1.0)
-            :type tfs: float
-            :param short_word_to_bias: Used with word_bias_threshold. The (singular) token to be biased.
-            :type short_word_to_bias: str
-            :param word_bias_threshold: Used with short_word_to_bias. The (float) threshold with which to bias a token.
-            :type word_bias_threshold: float
-            :param max_time: The maximum amount of time the model can use for generation.
-            :type max_time: float
+            Proxy for generation_command, see there for details.
             """
-
-            # Necessary so as not to show that on the client it won't say "application did not respond."
-            await a_interaction.response.defer()
-            # Encode the prompt given into a list of integers.
-            prompt_list = self.tokenizer.encode(prompt)
-            generation_args = {
-                "max_new_tokens": max_new_tokens,
-                "eos_token_id": eos_token_id,
-                "pad_token_id": pad_token_id,
-                "top_k": top_k,
-                "top_p": top_p,
-                "penalty_alpha": penalty_alpha,
-                "temperature": temperature,
-                "repetition_penalty": repetition_penalty,
-                "typical_p": typical_p,
-                "min_length": min_length,
-                "max_time": max_time,
-                "do_sample": do_sample,
-                "bad_words_ids": self.generation_args[
-                    'bad_words_ids'] if 'bad_words_ids' in self.generation_args.keys() else None,
-                "forced_words_ids": self.generation_args[
-                    'forced_words_ids'] if 'forced_words_ids' in self.generation_args.keys() else None
-            }
-
-            experimental_args = {
-                "experimental_warpers": {
-                },
-                "experimental_processors": {
-                }
-            }
-
-            if tfs is not None:
-                experimental_args['experimental_warpers']['tfs'] = tfs
-            if top_a is not None:
-                experimental_args['experimental_warpers']['top_a'] = top_a
-            if short_word_to_bias is not None and word_bias_threshold is not None:
-                # The doubly nested list is necessary as JSON cannot serialize tuples.
-                experimental_args['experimental_processors']["logit_bias"] = [
-                    [self.tokenize_single_token(short_word_to_bias), word_bias_threshold]]
-
-            generation_payload = {
-                "generation_settings": generation_args,
-                "chat_history": front_end_utils.get_encoded_str_from_token_list(prompt_list),
-                "device": self.memories.device,
-                "experimental_settings": experimental_args
-            }
-
-            serial_settings = json.dumps(generation_payload)
-            bot_response = self.request_generation(serial_settings)
-            if await self.validate_generation(bot_response, a_interaction= a_interaction):
-                decoded_bot_message = front_end_utils.decode_encoded_tokenized_tensor(bot_response)
-                detokenized_bot_message = self.detokenize_decoded_message(decoded_bot_message)
-                embedded_message = discord.Embed(title=f"{prompt}",
-                                                 description=detokenized_bot_message)
-                await a_interaction.followup.send(embed=embedded_message)
+            await self.generation_command(a_interaction, prompt=prompt, do_sample=do_sample,
+                                          max_new_tokens=max_new_tokens, temperature=temperature, top_k=top_k,
+                                          top_p=top_p, penalty_alpha=penalty_alpha,
+                                          repetition_penalty=repetition_penalty, typical_p=typical_p,
+                                          eos_token_id=eos_token_id, pad_token_id=pad_token_id, min_length=min_length,
+                                          top_a=top_a, tfs=tfs, short_word_to_bias=short_word_to_bias,
+                                          word_bias_threshold=word_bias_threshold, max_time=max_time)
 
         @self.tree.command(name="display_memories",
                            description="Print the content's of the chat bot's memory (excludes prompt).")
         async def display_memories(a_interaction: discord.Interaction):
             """
-            Displays all the memories of the chatbot into a discord embedded that contains
-            all the elements of the chat_history list.
-
-            :param a_interaction: The interaction which sprung from the user using a slash command. This will various
-            useful information, such as the message, the user who used said command, etc..
-            :type a_interaction: discord.Interaction
+            Proxy for display_memories_command, see there for details.
             """
-            # Necessary so as not to show that on the client it won't say "application did not respond."
-            await a_interaction.response.defer()
-            embedded_message = discord.Embed(title="Current Messages in Memory",
-                                             description="Heaven Knows, Earth Knows, I Know, You Know")
-
-            if len(self.memories.chat_history) < 2:
-                embedded_message.description = "No memories in chat history. Silence is Golden."
-            else:
-                for itr in range(1, len(self.memories.chat_history)):
-                    embedded_message.add_field(name="memory " + str(itr) + ": ", value=self.memories.chat_history[itr],
-                                               inline=False)
-            await a_interaction.followup.send(embed=embedded_message)
+            await self.display_memories_command(a_interaction)
 
         @self.tree.command(name="clear_memories",
                            description="Clears all memories and starts conversation from scratch.")
         async def clear_all_memories(a_interaction: discord.Interaction):
             """
-            Clears the chat history.
-
-            :param a_interaction: The interaction which sprung from the user using a slash command. This will various
-            useful information, such as the message, the user who used said command, etc..
-            :type a_interaction: discord.Interaction
+            Proxy for clear_all_memories_command, see there for details.
             """
-            # Necessary so as not to show that on the client it won't say "application did not respond."
-            await a_interaction.response.defer()
-            self.memories.clear_all_memories()
-            await a_interaction.followup.send("Successfully cleared memories.")
+            await self.clear_all_memories_command(a_interaction)
 
         @self.tree.command(name="regenerate_response", description="Regenerates the bot's last response.",
-                           guild=discord.Object(self.main_guild_id))
+                           guild=self.main_guild)
         async def regenerate(a_interaction: discord.Interaction):
             """
-            Deletes the bot's most recent response and regenerates a new one under certain conditions.
-
-            :description: Deletes the bot's most recent response and regenerates a new one under certain
-            conditions. Responds to a discord command of the same name. The circumstances for regeneration are:
-            1. Chat history must not be empty
-            2. The person who requested a regeneration must be the same person the bot responded to last
-            3. The most recent message must be from the bot
-            These restrictions are mostly necessary, otherwise error checking and the use of this command would be
-            horribly convoluted due to discord's restrictions on chat history. See further comments below.
-
-            :algorithm: 1. Defers the response to tell Discord to wait for a response longer
-            2. Checks if the chat history is populated or not on both the discord server and the front end.
-            3. Go through the various checks to ensure all conditions are met.
-            4. In the case of checking for if the bot reference is the same, check the discord cache or request the
-               reference.
-            5. If all conditions are met, delete the last message from the discord client and chat history,
-               and regenerate a response once more, following the same procedure as a typical chat.
-            :param a_interaction: The interaction which sprung from the user using a slash command. This will various
-            useful information, such as the message, the user who used said command, etc..
-            :type a_interaction: discord.Interaction
-            :acknowledgements: Large chunks of the function are borrowed from the following code below.
-            1. Checking for message replies.
-            https://stackoverflow.com/questions/66956261/check-if-message-reply-is-a-reply-type-message-discord-py
-            2. Checking if a user replied to the bot.
-            https://stackoverflow.com/questions/66016979/discord-py-send-a-different-message-if-a-user-replies-to-my-bot
-            3. Checking if the user referenced text within our nickname list.
-            https://stackoverflow.com/questions/68784024/discord-py-how-to-check-if-a-message-contains-text-from-a-list
+            Proxy for regenerate_command, see there for details.
             """
-            # Necessary so as not to show that on the client it won't say "application did not respond."
-            await a_interaction.response.defer()
+            await self.regenerate_command(a_interaction)
 
-            # check if chat history in memory is empty
-            if len(self.memories.chat_history) < 2:
-                await a_interaction.followup.send(
-                    "There is no prior chat history. There is nothing to regenerate!")
-                return
+    async def autocomplete_command(self, a_interaction: discord.Interaction):
+        """
+        name - autocomplete - Attempts to predict what the user will say next and sends said prediction via
+        webhook.
+
+        description: The associated function for a slash command of the same name.
+        This function attempts to predict what the user will say next by appending their username into
+        the chat history and letting the bot fill in the rest. The function utilizes a
+        web hook defined in settings (soon to be removed in favor of just creating webhooks on the fly).
+        Note that this function will not work if the setting is invalid. Here is the algorithm -
+
+        1. Defer the response to let discord wait for a response.
+        2. Set the username of whoever used the command as the pending turn.
+        3. Encode the chat history into base64.
+        4. Remove experimental settings for autocompletion, as we're trying to mimic ourselves, not the bot.
+           For example, let's say we're trying to get our bot to speak with a certain puncutation mark in mind to
+           appear frequently(via logit biases).
+           We do not want that same frequency to appear in predicting the user's speech.
+        5. Serialize the settings and re-add the experimental settings.
+        6. Send a request with the serialized settings excluding the experimental settings.
+        7. If our generation is valid, decode and detokenize our message retrieved from the server response.
+        8. Prepare the webhook payload. This will be our means of impersonating the user, as we can get their
+           username and avatar via the fact they used the command.
+        9. Send over the payload and check the response, sending a mesage if there are any errors.
+        10. If the payload was sent, complete the pending turn with the autocompleted message, otherwise discard it.
+            The webhook's message itself is ignored by on_message, so it only ends up in the chat history once.
+
+        :param a_interaction: The interaction which sprung from the user using a slash command. This will help
+        extract the user's username, avatar, to mimic them using a webhook.
+        :type a_interaction: discord.Interaction
+        """
+        # Necessary so as not to show that on the client it won't say "application did not respond."
+        await a_interaction.response.defer()
+
+        # Sets the username of whoever sent the command as the pending turn. This is necessary to tell the model
+        # "guess what this user will say next."
+        user_name = a_interaction.user.name
+        pending_turn = self.memories.set_pending_turn(f"{user_name}:", self.tokenizer)
+
+        # Preparation of the data to send over through the request. The experimental settings are left out to
+        # avoid certain logit biased puncutation/tokens appearing in the user's predicted speech.
+        # The encoding and serialization is done in another thread, so it doesn't hold up the bot for long chats.
+        chat_history_token_ids = self.memories.get_chat_history_token_ids()
+        serial_settings = await asyncio.to_thread(self.serialize_chat_history_token_ids, chat_history_token_ids,
+                                                  a_include_experimental_settings=False)
+
+        # Send over serialized settings for text generation, and decode the generated message. The request blocks
+        # until the model is done, so it's run in a thread to keep the bot responsive in the meantime.
+        bot_response = await asyncio.to_thread(self.request_generation, serial_settings)
+
+        if not await self.validate_generation(bot_response, a_interaction=a_interaction):
+            self.memories.discard_pending_turn(pending_turn)
+        else:
+            detokenized_bot_message = self.decode_bot_response(bot_response)
+
+            # Since the interaction has the user's username and avatar, we can use it to simulate their appearance
+            # via webhook, though webhooks work like tiny servers which we can respond to, we will need to set a
+            # json payload.
+            web_hook_payload = {
+                "content": detokenized_bot_message,
+                "username": user_name,
+                "avatar_url": a_interaction.user.avatar.url
+            }
+            # aiohttp takes the bytes orjson makes as is.
+            stringified_payload = orjson.dumps(web_hook_payload)
+            webhook_url = await self.get_or_create_webhook(a_interaction)
+            status = await self.send_webhook_payload(webhook_url, stringified_payload)
+            if status == 404:
+                # The cached webhook was deleted from the channel, so get a new one and try once more.
+                self.webhook_cache.pop(a_interaction.channel.id, None)
+                webhook_url = await self.get_or_create_webhook(a_interaction)
+                status = await self.send_webhook_payload(webhook_url, stringified_payload)
+            if status == 204:
+                # The memory is cycled in the background, while the message is sent off to Discord.
+                self.memories.complete_pending_turn(pending_turn, detokenized_bot_message, self.tokenizer,
+                                                    a_cycle_in_background=True)
+                # Clears the message such that it's empty. We only need the webhook's message which is sent seperately,
+                # so we delete the message on command.
+                await a_interaction.delete_original_response()
+            else:
+                self.memories.discard_pending_turn(pending_turn)
+                logging.error("The request to the webhook failed.")
+                await a_interaction.followup.send(f"There was an error, please check the console output. "
+                                                  f"Status code: {status}")
+
+    async def change_settings_command(self, a_interaction: discord.Interaction, do_sample: bool = None,
+                                      max_length: int = 1000, temperature: float = None, top_k: int = None,
+                                      top_p: float = None, penalty_alpha: float = None,
+                                      repetition_penalty: float = None, typical_p: float = None,
+                                      eos_token_id: int = 198, pad_token_id: int = 50256, min_length: int = None,
+                                      top_a: float = None, tfs: float = None, short_word_to_bias: str = None,
+                                      word_bias_threshold: float = None, max_time: float = None):
+        """
+        Changes the settings of the Discord_Provider Class Temporarily. No Changes are saved after shutdown.
+
+        :description: In essence, this function is a way to change settings on the fly. Don't like how your bot is
+        generating text? Well, this is an easy way to experiment solutions. A few caveats are the fact that the same
+        restrictions apply from the generation command, namely, you can only bias one word at a time since discord
+        does not have native list support for slash commands.
+
+        :algorithm: 1. Update the class body member's generation settings to match the ones passed through this command.
+        2. Create the experimental_settings key.
+        3. Create the experimental_warpers key within experimental_settings if top_a or tfs are passed.
+        4. Create the experimental_processors key within experimental_settings if short_word_to_bias and word_bias_threshold
+        are passed.
+        5. Update both the generation and experimental serial settings.
+        6. Respond directly. There's no need to defer, as all of this is done well within Discord's 3 second limit.
+
+        :param a_interaction: The interaction which sprung from the user using a slash command. In this case,
+        helps us get all the parameters for the command to generate text.
+        :type a_interaction: discord.Interaction
+        :param prompt: The prompt the model should generate text based off of.
+        :type prompt: str
+        :param do_sample: Whether to allow stochastic and multinominal sampling. Necessary for many params.
+        :type do_sample: bool
+        :param max_length: The maximum allowed amount of tokens
+        :type max_length: float
+        :param temperature: A sampler that makes values more randomly distributed at higher temperatures. (>=0.0)
+        :type temperature: float
+        :param top_k: A sampler that allows you to sample from the best of k tokens (>=0)
+        :type top_k: int
+        :param top_p: A sampler which only takes the tokens whose probabilities add up to top_p or higher. (0.0-1.0)
+        :type top_p: float
+        :param penalty_alpha: The hyperparameter alpha for contrastive search. A higher value penalizes homogenous results. (0.0-1.0)
+        :type penalty_alpha: float
+        :param repetition_penalty:  A sampler which penalizes repetitive tokens. (>=1.0)
+        :type repetition_penalty: float
+        :param typical_p: Samples similar to typical sampling in statistics. (0.0-1.0)
+        :type typical_p: float
+        :param eos_token_id: The id of the token the model should end a sentence with.
+        :type eos_token_id: int
+        :param pad_token_id: The id of the token to pad empty spaces in a sentence with.
+        :type pad_token_id: int
+        :param min_length: The minimum number of tokens to be generated.
+        :type min_length: int
+        :param top_a: Similar to top_p, albeit squares the probability times the threshold. (0.0-1.0)
+        :type top_a: float
+        :param tfs: A complicated sampler. Increase creativity at expense of coherency. (0.0-1.0)
+        :type tfs: float
+        :param short_word_to_bias: Used with word_bias_threshold. The (singular) token to be biased.
+        :type short_word_to_bias: str
+        :param word_bias_threshold: Used with short_word_to_bias. The (float) threshold with which to bias a token.
+        :type word_bias_threshold: float
+        :param max_time: The maximum amount of time the model can use for generation.
+        :type max_time: float
+        """
+        self.generation_args = self.build_generation_args(
+            max_length=max_length, eos_token_id=eos_token_id, pad_token_id=pad_token_id, top_k=top_k, top_p=top_p,
+            penalty_alpha=penalty_alpha, temperature=temperature, repetition_penalty=repetition_penalty,
+            typical_p=typical_p, min_length=min_length, max_time=max_time, do_sample=do_sample)
+
+        self.experimental_args = make_empty_experimental_args()
+        self.memories.max_length = max_length
+        if tfs is not None:
+            self.experimental_args['experimental_warpers']['tfs'] = tfs
+        if top_a is not None:
+            self.experimental_args['experimental_warpers']['top_a'] = top_a
+        if short_word_to_bias is not None and word_bias_threshold is not None:
+            # The doubly nested list is necessary as JSON cannot serialize tuples.
+            self.experimental_args['experimental_processors']["logit_bias"] = [
+                [self.tokenize_single_token(short_word_to_bias), word_bias_threshold]]
+        # Finally, update the serializable version of the settings. This is only pertinent to the discord provider.
+        self.serial_settings['experimental_settings'] = self.experimental_args
+        self.serial_settings['generation_settings'] = self.generation_args
+        self.cache_serialized_settings()
+
+        await a_interaction.response.send_message("Successfully changed temporary settings.")
+
+    async def generation_command(self, a_interaction: discord.Interaction, prompt: str, do_sample: bool = None,
+                                 max_new_tokens: int = 200, temperature: float = None, top_k: int = None,
+                                 top_p: float = None, penalty_alpha: float = None, repetition_penalty: float = None,
+                                 typical_p: float = None, eos_token_id: int = 198, pad_token_id: int = 50256,
+                                 min_length: int = None, top_a: float = None, tfs: float = None,
+                                 short_word_to_bias: str = None, word_bias_threshold: float = None,
+                                 max_time: float = None):
+        """
+        A function that allows the user to bypass settings as well as memories and directly send text generation
+        settings to the server.
+
+        :description: This function which responds to a discord slash command of the same name, the generate
+        function is quite odd in that it allows the user to bypass any and all pre-defined settings and
+        simply ping the server with their own parameters. As a result, this function has quite an amazing amount
+        of parameters. Note that none of these generations will be saved in chat history.
+        In addition, this was primarily added for a second use case of the models - text generation. Typically,
+        GPT models are finetuned on conversations but their base models are trained for text generation. Hence,
+        it'd be a shame not to use this feature.
+
+        :algorithm: 1. Defer the response so as let Discord know to wait for a response.
+        2. Encode the prompt that was passed.
+        3. Prepare both the generation and experimental settings.
+        4. Create a generation payload with the generation settings and experimental settings, and serializes it.
+        5. Send a response to the server using said payload.
+        6. Validate the response. If valid, receive and decode the response.
+        7. Send the decoded message back through the bot.
+
+        :param a_interaction: The interaction which sprung from the user using a slash command. In this case,
+        helps us get all the parameters for the command to generate text.
+        :type a_interaction: discord.Interaction
+        :param prompt: The prompt the model should generate text based off of.
+        :type prompt: str
+        :param do_sample: Whether to allow stochastic and multinominal sampling. Necessary for many params.
+        :type do_sample: bool
+        :param max_new_tokens: The amount of tokens in integers to generate.
+        :type max_new_tokens: float
+        :param temperature: A sampler that makes values more randomly distributed at higher temperatures. (>=0.0)
+        :type temperature: float
+        :param top_k: A sampler that allows you to sample from the best of k tokens (>=0)
+        :type top_k: int
+        :param top_p: A sampler which only takes the tokens whose probabilities add up to top_p or higher. (0.0-1.0)
+        :type top_p: float
+        :param penalty_alpha: The hyperparameter alpha for contrastive search. A higher value penalizes homogenous results. (0.0-1.0)
+        :type penalty_alpha: float
+        :param repetition_penalty:  A sampler which penalizes repetitive tokens. (>=1.0)
+        :type repetition_penalty: float
+        :param typical_p: Samples similar to typical sampling in statistics. (0.0-1.0)
+        :type typical_p: float
+        :param eos_token_id: The id of the token the model should end a sentence with.
+        :type eos_token_id: int
+        :param pad_token_id: The id of the token to pad empty spaces in a sentence with.
+        :type pad_token_id: int
+        :param min_length: The minimum number of tokens to be generated.
+        :type min_length: int
+        :param top_a: Similar to top_p, albeit squares the probability times the threshold. (0.0-1.0)
+        :type top_a: float
+        :param tfs: A complicated sampler. Increase creativity at expense of coherency. (0.0-1.0)
+        :type tfs: float
+        :param short_word_to_bias: Used with word_bias_threshold. The (singular) token to be biased.
+        :type short_word_to_bias: str
+        :param word_bias_threshold: Used with short_word_to_bias. The (float) threshold with which to bias a token.
+        :type word_bias_threshold: float
+        :param max_time: The maximum amount of time the model can use for generation.
+        :type max_time: float
+        """
+
+        # Necessary so as not to show that on the client it won't say "application did not respond."
+        await a_interaction.response.defer()
+        # Encode the prompt given into a list of integers.
+        prompt_list = self.tokenizer.encode(prompt)
+        generation_args = self.build_generation_args(
+            max_new_tokens=max_new_tokens, eos_token_id=eos_token_id, pad_token_id=pad_token_id, top_k=top_k,
+            top_p=top_p, penalty_alpha=penalty_alpha, temperature=temperature,
+            repetition_penalty=repetition_penalty, typical_p=typical_p, min_length=min_length, max_time=max_time,
+            do_sample=do_sample)
+
+        experimental_args = make_empty_experimental_args()
+
+        if tfs is not None:
+            experimental_args['experimental_warpers']['tfs'] = tfs
+        if top_a is not None:
+            experimental_args['experimental_warpers']['top_a'] = top_a
+        if short_word_to_bias is not None and word_bias_threshold is not None:
+            # The doubly nested list is necessary as JSON cannot serialize tuples.
+            experimental_args['experimental_processors']["logit_bias"] = [
+                [self.tokenize_single_token(short_word_to_bias), word_bias_threshold]]
+
+        generation_payload = {
+            "generation_settings": generation_args,
+            "chat_history": front_end_utils.get_encoded_str_from_token_list(prompt_list),
+            "device": self.memories.device,
+            "experimental_settings": experimental_args
+        }
+
+        serial_settings = orjson.dumps(generation_payload).decode("utf-8")
+        bot_response = await asyncio.to_thread(self.request_generation, serial_settings)
+        if await self.validate_generation(bot_response, a_interaction= a_interaction):
+            detokenized_bot_message = self.decode_bot_response(bot_response)
+            embedded_message = discord.Embed(title=f"{prompt}",
+                                             description=detokenized_bot_message)
+            await a_interaction.followup.send(embed=embedded_message)
+
+    async def display_memories_command(self, a_interaction: discord.Interaction):
+        """
+        Displays all the memories of the chatbot into a discord embedded that contains
+        all the elements of the chat_history deque.
+
+        :param a_interaction: The interaction which sprung from the user using a slash command. This will various
+        useful information, such as the message, the user who used said command, etc..
+        :type a_interaction: discord.Interaction
+        """
+        # Unlike most commands, this one does not defer, as it is quick enough to respond directly.
+        # The memory may still be cycling in the background, which has to finish before going through the memories.
+        self.memories.wait_for_memory_cycler()
+        if len(self.memories.chat_history) < 2:
+            embedded_message = discord.Embed(title="Current Messages in Memory",
+                                             description="No memories in chat history. Silence is Golden.")
+            await a_interaction.response.send_message(embed=embedded_message)
+            return
+
+        # Rather than one embed field per memory (an embed can only hold 25 fields), the memories are packed into as
+        # few embed descriptions as possible. Each embed is sent in its own message, as Discord caps the text of
+        # all the embeds in a message at 6000 characters.
+        memories = [f"Memory {itr}: {memory}" for itr, memory in
+                    enumerate(itertools.islice(self.memories.chat_history, 1, None), start=1)]
+        memory_chunks = front_end_utils.pack_messages_into_chunks(memories, 4000)
+        for memory_chunk in memory_chunks:
+            embedded_message = discord.Embed(title="Current Messages in Memory", description=memory_chunk)
+            embedded_message.set_footer(text="Heaven Knows, Earth Knows, I Know, You Know")
+            # Only the first message can be the response itself, the rest have to be followups.
+            if a_interaction.response.is_done():
+                await a_interaction.followup.send(embed=embedded_message)
+            else:
+                await a_interaction.response.send_message(embed=embedded_message)
+
+    async def clear_all_memories_command(self, a_interaction: discord.Interaction):
+        """
+        Clears the chat history.
+
+        :param a_interaction: The interaction which sprung from the user using a slash command. This will various
+        useful information, such as the message, the user who used said command, etc..
+        :type a_interaction: discord.Interaction
+        """
+        # Clearing is instant, so there's no need to defer, just respond right away.
+        self.memories.clear_all_memories()
+        await a_interaction.response.send_message("Successfully cleared memories.")
+
+    async def regenerate_command(self, a_interaction: discord.Interaction):
+        """
+        Deletes the bot's most recent response and regenerates a new one under certain conditions.
+
+        :description: Deletes the bot's most recent response and regenerates a new one under certain
+        conditions. Responds to a discord command of the same name. The circumstances for regeneration are:
+        1. Chat history must not be empty
+        2. The person who requested a regeneration must be the same person the bot responded to last
+        3. The most recent message must be from the bot
+        These restrictions are mostly necessary, otherwise error checking and the use of this command would be
+        horribly convoluted due to discord's restrictions on chat history. See further comments below.
+
+        :algorithm: 1. Checks if the chat history is populated in the front end. If not, respond right away.
+        2. Defers the response to tell Discord to wait for a response longer
+        3. Checks if the chat history is populated or not on the discord server. If the
+           bot's last reply is still the most recent message in the channel, it's used as is rather than asking
+           Discord for the channel history.
+        4. Go through the various checks to ensure all conditions are met.
+        5. In the case of checking for if the bot reference is the same, check the discord cache or request the
+           reference.
+        6. If all conditions are met, delete the last message from the discord client and chat history,
+           and regenerate a response once more, following the same procedure as a typical chat.
+        :param a_interaction: The interaction which sprung from the user using a slash command. This will various
+        useful information, such as the message, the user who used said command, etc..
+        :type a_interaction: discord.Interaction
+        :acknowledgements: Large chunks of the function are borrowed from the following code below.
+        1. Checking for message replies.
+        https://stackoverflow.com/questions/66956261/check-if-message-reply-is-a-reply-type-message-discord-py
+        2. Checking if a user replied to the bot.
+        https://stackoverflow.com/questions/66016979/discord-py-send-a-different-message-if-a-user-replies-to-my-bot
+        3. Checking if the user referenced text within our nickname list.
+        https://stackoverflow.com/questions/68784024/discord-py-how-to-check-if-a-message-contains-text-from-a-list
+        """
+        # check if chat history in memory is empty. Done before deferring, as it can be answered right away.
+        self.memories.wait_for_memory_cycler()
+        if len(self.memories.chat_history) < 2:
+            await a_interaction.response.send_message(
+                "There is no prior chat history. There is nothing to regenerate!")
+            return
+
+        # Grabbed before deferring, as the deferred response is itself a new message in the channel.
+        message = self.last_bot_message
+        # Necessary so as not to show that on the client it won't say "application did not respond."
+        await a_interaction.response.defer()
 
-            message = ""
+        if message is None or message.channel.id != a_interaction.channel_id:
             history_itr = 0
             # check if chat history in the discord channel is empty
             # note: while this is very ugly, there is no known other way to work with this, as this is an async
@@ -524,38 +700,64 @@ class Discord_Provider(discord.Client, provider.Provider):
                     message = messages
                 history_itr = history_itr + 1
 
-            # If the same person who requested the regeneration is the same person who the bot's most recent reply was
-            # to.
-            if message.author.id == self.user.id:
-                # https://stackoverflow.com/questions/66956261/check-if-message-reply-is-a-reply-type-message-discord-py
-                # https://stackoverflow.com/questions/66016979/discord-py-send-a-different-message-if-a-user-replies-to-my-bot
-                if message.reference is not None:
-                    original_message = None
-                    if message.reference.cached_message is None:
-                        # Fetching the message
-                        channel = discord.Client.get_channel(message.reference.channel_id)
-                        original_message = await channel.fetch_message(message.reference.message_id)
-                    else:
-                        original_message = message.reference.cached_message
-                    if original_message is not None and original_message.author.id == a_interaction.user.id:
-                        self.memories.pop_memory()
-                        self.memories.pop_memory()
-                        await message.delete()
-                        await self.send_discord_message(original_message)
-                        await a_interaction.delete_original_response()
-                        return
-                    else:
-                        await a_interaction.followup.send(
-                            "Last message was a response to someone else. Only regen responses sent to you! ")
-                        return
+        # If the same person who requested the regeneration is the same person who the bot's most recent reply was
+        # to.
+        if message.author.id == self.bot_id:
+            # https://stackoverflow.com/questions/66956261/check-if-message-reply-is-a-reply-type-message-discord-py
+            # https://stackoverflow.com/questions/66016979/discord-py-send-a-different-message-if-a-user-replies-to-my-bot
+            if message.reference is not None:
+                original_message = None
+                if message.reference.cached_message is None:
+                    # Fetching the message
+                    original_message = await self.fetch_referenced_message(message.reference)
+                else:
+                    original_message = message.reference.cached_message
+                if original_message is not None and original_message.author.id == a_interaction.user.id:
+                    self.memories.pop_memory()
+                    self.memories.pop_memory()
+                    self.last_bot_message = None
+                    await message.delete()
+                    await self.send_discord_message(original_message)
+                    await a_interaction.delete_original_response()
+                    return
                 else:
                     await a_interaction.followup.send(
-                        "The most recent message didn't include a reference from the bot.")
-
+                        "Last message was a response to someone else. Only regen responses sent to you! ")
+                    return
             else:
                 await a_interaction.followup.send(
-                    "The most recent message wasn't a bot message! Only regen the most recent bot message.")
-                return
+                    "The most recent message didn't include a reference from the bot.")
+
+        else:
+            await a_interaction.followup.send(
+                "The most recent message wasn't a bot message! Only regen the most recent bot message.")
+            return
+
+    async def fetch_referenced_message(self, a_reference: discord.MessageReference):
+        """
+        Fetches the message that a reply refers to, for when Discord doesn't have it cached.
+
+        :description: Fetches the message that a reply refers to from Discord, unless it's been fetched recently, in
+        which case the earlier one is reused. People tend to reply to the same message over and over in a
+        conversation, and every fetch is a request to Discord that counts against the bot's rate limit. Only the
+        author of the message is ever looked at, which never changes, so an old copy is as good as a new one.
+        :param a_reference: The reference of the reply.
+        :type a_reference: discord.MessageReference
+        :return: The message that was replied to.
+        :rtype: discord.Message
+        """
+        cache_key = (a_reference.channel_id, a_reference.message_id)
+        referenced_message = self.referenced_message_cache.get(cache_key)
+        if referenced_message is not None:
+            self.referenced_message_cache.move_to_end(cache_key)
+            return referenced_message
+
+        channel = self.get_channel(a_reference.channel_id) or await self.fetch_channel(a_reference.channel_id)
+        referenced_message = await channel.fetch_message(a_reference.message_id)
+        self.referenced_message_cache[cache_key] = referenced_message
+        if len(self.referenced_message_cache) > REFERENCED_MESSAGE_CACHE_SIZE:
+            self.referenced_message_cache.popitem(last=False)
+        return referenced_message
 
     async def send_discord_message(self, a_message):
         """
@@ -567,9 +769,10 @@ class Discord_Provider(discord.Client, provider.Provider):
         already see the bot's name. Hence, there is a bit of manipulating with the prompt and chat history to trim this.
 
         :algorithm:1. Sanitize the sent message and format it to be in the proper chat history format and append it.
-        2. Append the bot's name such that the message generated will only have the next, not the bot's name.
+        2. Set the bot's name as the pending turn such that the message generated will only have the next, not the
+           bot's name.
         3. Encode the chat history and serialize the settings and send it via a request.
-        4. Get the response back, pop the bot message with the bot's username, and append the message.
+        4. Get the response back, and complete the pending turn with the message, or discard it if it's not valid.
         5. If the generated response is valid,
         Send the message via the discord client, whether be it through a reply or just a message.
         :param a_message: the message to reply to.
@@ -579,24 +782,28 @@ class Discord_Provider(discord.Client, provider.Provider):
 
         """
 
-        user_message = "" + a_message.author.name + ": " + a_message.content + "\n"
+        user_message = f"{a_message.author.name}: {a_message.content}\n"
         self.memories.append_message(user_message, a_tokenizer=self.tokenizer)
         # Necessary such that we only get the bot's response, not the bot's name when the text generates.
-        self.memories.append_message(self.bot_name + ":", a_tokenizer=self.tokenizer)
+        pending_turn = self.memories.set_pending_turn(self.bot_prompt, self.tokenizer,
+                                                      a_prefix_token_ids=self.bot_prompt_token_ids)
 
-        self.serial_settings['chat_history'] = self.memories.get_encoded_chat_history(a_tokenizer=self.tokenizer)
+        # Grabbed right away, as the chat history may change while the bot is busy encoding it in another thread.
+        chat_history_token_ids = self.memories.get_chat_history_token_ids()
         # Simulate the bot typing.
         async with a_message.channel.typing():
-            serial_settings = json.dumps(self.serial_settings)
+            serial_settings = await asyncio.to_thread(self.serialize_chat_history_token_ids, chat_history_token_ids)
 
-            bot_response = self.request_generation(serial_settings)
-            if await self.validate_generation(bot_response, a_message=a_message):
-                decoded_bot_message = front_end_utils.decode_encoded_tokenized_tensor(bot_response)
-                detokenized_bot_message = self.detokenize_decoded_message(decoded_bot_message)
-                # Remove the original empty prompt.
-                self.memories.pop_memory()
-                self.memories.append_message(self.bot_name + ": " + detokenized_bot_message, a_tokenizer=self.tokenizer)
-                await a_message.reply(detokenized_bot_message)
+            # Sent from another thread, so the bot can keep up with Discord while the backend is generating.
+            bot_response = await asyncio.to_thread(self.request_generation, serial_settings)
+            if not await self.validate_generation(bot_response, a_message=a_message):
+                self.memories.discard_pending_turn(pending_turn)
+            else:
+                detokenized_bot_message = self.decode_bot_response(bot_response)
+                # The memory is cycled in the background, while the message is sent off to Discord.
+                self.memories.complete_pending_turn(pending_turn, detokenized_bot_message, self.tokenizer,
+                                                    a_cycle_in_background=True)
+                self.last_bot_message = await a_message.reply(detokenized_bot_message)
 
     async def conditional_responses(self, a_message: discord.Message):
         """
@@ -604,6 +811,21 @@ class Discord_Provider(discord.Client, provider.Provider):
 
         :param a_message: The Message to potentially reply to.
         :type a_message: discord.Message
+        """
+        if await self.should_respond(a_message):
+            await self.send_discord_message(a_message)
+
+    async def should_respond(self, a_message: discord.Message):
+        """
+        Checks if the bot is replied to, mentioned, or their nickname(s) are in a user's message.
+
+        :description: Checks if the bot is replied to, mentioned, or their nickname(s) are in a user's message. The
+        checks go from cheapest to most expensive, and stop as soon as one passes. Checking a reply is last, as it
+        might mean asking Discord for the message that was replied to.
+        :param a_message: The Message to potentially reply to.
+        :type a_message: discord.Message
+        :return: Whether the bot should respond to the message.
+        :rtype: bool
         :acknowledgements: Large chunks of the function are borrowed from the following code below.
 
         1. Checking for message replies.
@@ -614,26 +836,19 @@ class Discord_Provider(discord.Client, provider.Provider):
         https://stackoverflow.com/questions/68784024/discord-py-how-to-check-if-a-message-contains-text-from-a-list
         """
         if self.user.mentioned_in(a_message):
-            await self.send_discord_message(a_message)
-            return
+            return True
+
+        if self.nickname_regex is not None and self.nickname_regex.search(a_message.content):
+            return True
 
         if a_message.reference is not None:
-            original_message = None
-            if a_message.reference.cached_message is None:
+            original_message = a_message.reference.cached_message
+            if original_message is None:
                 # Fetching the message
-                channel = discord.Client.get_channel(a_message.reference.channel_id)
-                original_message = await channel.fetch_message(a_message.reference.message_id)
-                return
-            else:
-                original_message = a_message.reference.cached_message
-            if original_message is not None and original_message.author.id == self.user.id:
-                await self.send_discord_message(a_message)
-                return
+                original_message = await self.fetch_referenced_message(a_message.reference)
+            return original_message is not None and original_message.author.id == self.bot_id
 
-        for names in self.bot_nicknames:
-            if names in a_message.content:
-                await self.send_discord_message(a_message)
-                return
+        return False
 
     async def on_ready(self):
         """
@@ -644,27 +859,32 @@ class Discord_Provider(discord.Client, provider.Provider):
         3. Setting the Bot's status.
         """
         print(f"Successfully connected to Discord API")
+        self.bot_id = self.user.id
         # Syncs commands with the main guild. I would do global commands, but I heard they take up to an hour to sync.
-        self.tree.copy_global_to(guild=discord.Object(self.main_guild_id))
-        await self.tree.sync(guild=discord.Object(id=self.main_guild_id))
+        if self.main_guild is not None:
+            self.tree.copy_global_to(guild=self.main_guild)
+            await self.tree.sync(guild=self.main_guild)
+        else:
+            await self.tree.sync()
         print("Succesfully synched with commands.")
 
         # Set the status of the discord bot. This is mostly for flair and is optional, but I think it's neat.
-        if "status_type" and "status_body" and "stream_url" in self.discord_provider_settings.keys() and \
-                self.discord_provider_settings['status_type'] == "streaming":
-            await discord.Client.change_presence(
-                activity=discord.Activity(self, type=discord.ActivityType.streaming, name=self.status_body,
-                                          url="stream_url"))
-        if "status_type" and "status_body" in self.discord_provider_settings.keys():
-            if self.status_type == "playing":
-                await discord.Client.change_presence(self, activity=discord.Game(name=self.status_body))
-            if self.status_type == "listening":
-                await discord.Client.change_presence(self,
-                                                     activity=discord.Activity(type=discord.ActivityType.listening,
-                                                                               name=self.status_body))
-            if self.status_type == "watching":
-                await discord.Client.change_presence(self, activity=discord.Activity(type=discord.ActivityType.watching,
-                                                                                     name=self.status_body))
+        if self.status_type is not None and self.status_body is not None:
+            activity = None
+            match self.status_type:
+                case "streaming":
+                    stream_url = self.discord_provider_settings.get('stream_url')
+                    if stream_url is not None:
+                        activity = discord.Activity(type=discord.ActivityType.streaming, name=self.status_body,
+                                                    url=stream_url)
+                case "playing":
+                    activity = discord.Game(name=self.status_body)
+                case "listening":
+                    activity = discord.Activity(type=discord.ActivityType.listening, name=self.status_body)
+                case "watching":
+                    activity = discord.Activity(type=discord.ActivityType.watching, name=self.status_body)
+            if activity is not None:
+                await self.change_presence(activity=activity)
 
     async def on_message(self, a_message):
         """
@@ -674,11 +894,28 @@ class Discord_Provider(discord.Client, provider.Provider):
         :param a_message: the message that the bot has seen be sent in a channel its in and can see.
         :type a_message: discord.Message
         """
-        if a_message.author.id == self.user.id:
+        # Anything sent after the bot's last reply in the same channel means it's no longer the most recent message.
+        if self.last_bot_message is not None and a_message.channel.id == self.last_bot_message.channel.id and \
+                a_message.id != self.last_bot_message.id:
+            self.last_bot_message = None
+        if a_message.author.id == self.bot_id:
+            return
+        # Webhook messages are either the bot's own autocompletes, which are already in the chat history, or from other
+        # integrations, neither of which should be replied to.
+        if a_message.webhook_id is not None:
+            return
+        # Nothing to respond to in a message that's only attachments or embeds.
+        if not a_message.content:
             return
         if a_message.is_system():
             return
         if self.conditional_response:
+            # Most messages aren't meant for the bot at all. Those that aren't a reply, a mention, or have a nickname in
+            # them are dropped right here, without going through conditional_responses. Any that pass are checked again
+            # there, but they're about to be sent to the model anyway, so that hardly matters.
+            if a_message.reference is None and not self.user.mentioned_in(a_message) and \
+                    (self.nickname_regex is None or not self.nickname_regex.search(a_message.content)):
+                return
             await self.conditional_responses(a_message)
         else:
             await self.send_discord_message(a_message)
@@ -694,7 +931,7 @@ class Discord_Provider(discord.Client, provider.Provider):
         other functions to continue executing or not.
 
         :algorithm: 1. Check if a_generation is of type integer. This means it has an error code, not generated text.
-        2. If so, match the case and change the value of error message accordingly.
+        2. If so, look up the error message for that code, or build one from the HTTP status code.
         3. Send an error message depending on whether the value passed is of type discord.Interaction or discord.Message
         4. If that is not the case, check if it equals to None.
         5. If a discord.Message is passed, clear the memories. Regardless, send an error message through the
@@ -708,18 +945,11 @@ class Discord_Provider(discord.Client, provider.Provider):
         :return: Whether the passed generated text is valid or not.
         :rtype: bool
         """
-        error_msg = ""
-        if type(a_generation) is int:
-            match a_generation:
-                case 0:
-                    error_msg = "There was a timeout error during generation. Please check the console error logs."
-                case -1:
-                    error_msg = "There was a request error during generation. Please check the console error logs."
-                case -2:
-                    error_msg = "There was a generic error during generation. Please check the console error logs."
-                case _:
-                    error_msg = "There was an http error during generation. Please check the following status " \
-                                f"code: {a_generation}, and also please check the console error logs."
+        if isinstance(a_generation, int):
+            error_msg = GENERATION_ERROR_MESSAGES.get(a_generation)
+            if error_msg is None:
+                error_msg = "There was an http error during generation. Please check the following status " \
+                            f"code: {a_generation}, and also please check the console error logs."
             if a_interaction is not None:
                 await a_interaction.followup.send(error_msg)
             else:
@@ -1,6 +1,10 @@
-import base64
-import json
-import typing
+import orjson
+
+# pybase64 is an optional, SIMD accelerated drop-in replacement for base64. Falls back to base64 if it's not installed.
+try:
+    import pybase64 as base64
+except ImportError:
+    import base64
 
 
 def flatten_nested_dictionary(a_data):
@@ -9,28 +13,66 @@ def flatten_nested_dictionary(a_data):
 
     :description: Flattens a multidimensional dictionary into a 1d dictionary. This means all keys and values
     are at the same level, regardless of nesting. Why? Because this is to aid in simply checking for settings. Because
-    there can be up to 3-4 nested dimensions of dictionaries, this function is recursive.
+    there can be up to 3-4 nested dimensions of dictionaries, this function keeps a stack of the dictionaries it's
+    still going through, rather than calling itself for every nested dictionary.
     :param a_data: The data to collapse. Varies between dict, list, string, float, and int.
     :return: A 1-d dictionary with all the keys and values stored in one place.
     :acknowledgements: Heavily Modified from
     https://stackoverflow.com/questions/52081545/python-3-flattening-nested-dictionaries-and-lists-within-dictionaries
     """
     out = {}
-    if type(a_data) != list and type(a_data) != dict and type(a_data)!= typing.Tuple:
-        return a_data
-    elif a_data is None:
+    if a_data is None:
         return ""
-    for key, val in a_data.items():
-        if isinstance(val, dict):
-            val = [val]
-        if isinstance(val, list):
-            for subdict in val:
-                if type(subdict) == dict or type(subdict) == list:
-                    deeper = flatten_nested_dictionary(subdict).items()
-                    out.update({key2: val2 for key2, val2 in deeper})
-        else:
+    if not isinstance(a_data, (dict, list, tuple)):
+        return a_data
+    # The top of the stack is always the dictionary currently being gone through. Going through a nested dictionary
+    # before the rest of its parent keeps the same order as the recursion did, so later keys still win.
+    if isinstance(a_data, dict):
+        stack = [iter(a_data.items())]
+    else:
+        stack = [iter(subdict.items()) for subdict in reversed(a_data) if isinstance(subdict, dict)]
+    while stack:
+        for key, val in stack[-1]:
+            if isinstance(val, dict):
+                stack.append(iter(val.items()))
+                break
+            if isinstance(val, (list, tuple)):
+                # Only dictionaries within lists hold settings. Reversed so the first one ends up on top.
+                stack.extend(iter(subdict.items()) for subdict in reversed(val) if isinstance(subdict, dict))
+                break
             out[key] = val
+        else:
+            stack.pop()
     return out
+def collect_setting_keys(a_data):
+    """
+    Given a multidimensional dictionary, collect the keys of all of its settings into a single set.
+
+    :description: Goes through the dictionary the same way flatten_nested_dictionary does, but only keeps the keys of
+    the settings rather than the settings themselves. That's all that's needed to check whether a setting exists, so
+    there's no need to build a whole flattened dictionary just to throw its values away.
+    :param a_data: The data to collect the keys of. Varies between dict, list, string, float, and int.
+    :return: The keys of every setting, regardless of how nested they are.
+    :rtype: set
+    """
+    keys = set()
+    if isinstance(a_data, dict):
+        stack = [a_data]
+    elif isinstance(a_data, (list, tuple)):
+        stack = [subdict for subdict in a_data if isinstance(subdict, dict)]
+    else:
+        return keys
+    # Unlike when flattening, the order doesn't matter here, so each dictionary is gone through in one go.
+    while stack:
+        for key, val in stack.pop().items():
+            if isinstance(val, dict):
+                stack.append(val)
+            elif isinstance(val, (list, tuple)):
+                # Only dictionaries within lists hold settings.
+                stack.extend(subdict for subdict in val if isinstance(subdict, dict))
+            else:
+                keys.add(key)
+    return keys
 def decode_encoded_tokenized_tensor(a_encoded_tokens):
     """
     Decode a base64 encoded tokenized tensor into a plain string.
@@ -43,8 +85,8 @@ def decode_encoded_tokenized_tensor(a_encoded_tokens):
     :rtype: str
     :acknowledgements: Antony Mercurio, who recommended me to utilize this method and gave me portions of the code.
     """
-    partial_decoded_history = base64.b64decode(a_encoded_tokens)
-    return json.loads(partial_decoded_history.decode("utf-8"))
+    # orjson parses the decoded bytes directly, no need to turn them into a string first.
+    return orjson.loads(base64.b64decode(a_encoded_tokens))
 
 
 def get_encoded_str_from_token_list(a_message):
@@ -57,11 +99,12 @@ def get_encoded_str_from_token_list(a_message):
     the python pickle library or making a large multidimensional list, which would require quite the lot of string
     manipulation. So, I chose the lesser of the two evils and decided to use base64 as my serialization algorithm.
 
-    :algorithm: 1. First, the list itself is converted to a json readable string so it can be broken down into raw bytes.
-    2. The string is then turned into bytes to prepare it for base64 encoding.
+    :algorithm: 1. First, the list itself is converted to json, straight into raw bytes.
+    2. The bytes are then base64 encoded.
     3. Then, the encoded base64 are turned into a string.
-    4. This might seem counterintuitive, but the string is then decoded for utf-8. Why? So it can be sent via json.
-       Otherwise, there'd be no way to send it over, and I've confirmed the string itself is still base64 encoded.
+    4. This might seem counterintuitive, but the string is then wrapped in quotes, just as if it were json encoded.
+       Why? So it can be sent via json. Otherwise, there'd be no way to send it over, and I've confirmed the string
+       itself is still base64 encoded.
 
     :param a_message: The list of tokens representing an arbitrary message. Typically, is the entire chat history in
     practice, however.
@@ -69,5 +112,43 @@ def get_encoded_str_from_token_list(a_message):
     :rtype: str
     :acknowledgements: Antony Mercurio, who recommended me to utilize this method and gave me portions of the code.
     """
-    encoded_str = json.dumps(base64.b64encode(bytes(json.dumps(a_message), encoding='utf-8')).decode("utf-8"))
+    # orjson writes compact json straight to bytes, so there's no space after every comma and no extra conversion
+    # from str to bytes. The backend's json parsing doesn't care either way.
+    # Base64 never has any characters that need escaping, so quoting it by hand is the same as json encoding it, just
+    # without scanning the whole string again.
+    encoded_str = '"' + base64.b64encode(orjson.dumps(a_message)).decode("ascii") + '"'
     return encoded_str
+
+
+def pack_messages_into_chunks(a_messages, a_max_chunk_length):
+    """
+    Packs a list of messages into as few newline separated chunks as possible.
+
+    :description: Mostly used to fit memories into Discord embeds, which have a hard limit on their length. Messages
+    are added to the current chunk until the next one would not fit, in which case a new chunk is started. A message
+    that is longer than a chunk by itself is cut into pieces.
+
+    :param a_messages: The messages to pack.
+    :type a_messages: [str]
+    :param a_max_chunk_length: The maximum amount of characters in a chunk.
+    :type a_max_chunk_length: int
+    :return: The packed chunks, in the same order as the messages.
+    :rtype: [str]
+    """
+    chunks = []
+    current_chunk = []
+    current_length = 0
+    for message in a_messages:
+        pieces = [message[itr:itr + a_max_chunk_length] for itr in range(0, len(message), a_max_chunk_length)] or [""]
+        for piece in pieces:
+            # The + 1 is for the newline that joins the piece to the rest of the chunk.
+            new_length = current_length + len(piece) + (1 if current_chunk else 0)
+            if current_chunk and new_length > a_max_chunk_length:
+                chunks.append("\n".join(current_chunk))
+                current_chunk = []
+                new_length = len(piece)
+            current_chunk.append(piece)
+            current_length = new_length
+    if current_chunk:
+        chunks.append("\n".join(current_chunk))
+    return chunks
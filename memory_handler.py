@@ -1,7 +1,9 @@
+import itertools
 import json
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 import settings_handler
-import torch
 from transformers import AutoTokenizer
 import sys
 import front_end_utils
@@ -22,10 +24,32 @@ class Memory_Handler:
         self.max_length = None
         self.prompt = ""
         self.prompt_tensor = None
-        self.chat_history = []
+        self.prompt_tensor_size = 0
+        # A deque rather than a list, as the memory cyclers remove the oldest messages from the front, which is O(1)
+        # for a deque but O(n) for a list.
+        self.chat_history = deque()
+        # The token ids of each message in chat_history, at the same index. Each message is only tokenized once, when
+        # it's appended, rather than the whole chat history being re-tokenized every time it's sent.
+        self.chat_history_token_ids = deque()
+        # The amount of tokens in the whole chat history, prompt included. Kept up to date alongside
+        # chat_history_token_ids, so the memory cyclers never have to tokenize anything just to know the size.
+        self.total_tokens = 0
+        # The base64 encoded chat history, as sent to the backend. None whenever the chat history has changed since it
+        # was last encoded.
+        self.encoded_chat_history = None
+        # The start of a message that's still being generated, i.e. a name followed by a colon, alongside its token
+        # ids. It's sent with the chat history, but only becomes part of it once the rest of the message is generated.
+        self.pending_turn = None
+        # A single worker, so memory cycling can be done in the background, i.e. while the user is still typing. Only
+        # one cycle ever runs at once, and everything else that touches the chat history waits for it first.
+        self.memory_cycler_executor = ThreadPoolExecutor(max_workers=1)
+        self.memory_cycler_future = None
         self.settings_object = a_settings_handler
         self.load_netherworld_settings(a_settings_handler)
         self.load_generation_settings(a_settings_handler)
+        # The memory cycler type never changes after loading, so the right cycler is picked once here rather than
+        # checked for on every single message appended.
+        self.dispatch_memory_cycler = self.select_memory_cycler()
 
     def load_netherworld_settings(self, a_settings_handler : settings_handler.Settings_Handler):
         """
@@ -67,37 +91,215 @@ class Memory_Handler:
         # main spawner of the chatbot's personality. This is why it is a setting, because it always stays in the chat
         # history regardless of the cycling done. Otherwise, the bot would not be able to have a consistent personality.
         self.prompt = a_settings_handler.settings['input_settings']['prompt']
-        self.prompt_tensor = a_settings_handler.tokenizer.encode(self.prompt, return_tensors="pt")
+        # Already tokenized by the settings handler when checking it isn't larger than max_length.
+        self.prompt_tensor = a_settings_handler.prompt_tensor
+        # The prompt never changes, so neither does its size. Measured once here rather than on every cycle.
+        self.prompt_tensor_size = self.prompt_tensor.size(dim=1)
         self.chat_history.append(self.prompt)
+        self.chat_history_token_ids.append(self.prompt_tensor[0].tolist())
+        self.total_tokens = len(self.chat_history_token_ids[0])
 
-    def dispatch_memory_cycler(self, a_tokenizer : AutoTokenizer):
+    def select_memory_cycler(self):
         """
-        Dispatches the memory cyclers either by_sentence or by_token.
+        Selects the memory cycler to be dispatched, based on the memory_cycler setting.
+
+        :description: Done once when loading the settings, so that dispatching the memory cycler after every message
+        doesn't have to check which one to use every time. Without a max_length there's nothing to cycle down to, so
+        no memory cycling is done at all in that case, no matter which memory cycler was set.
+
+        :return: The method that dispatches the selected memory cycler, taking the tokenizer as its only argument.
+        :rtype: Callable[[AutoTokenizer], None]
+        """
+        if self.max_length is None:
+            return self.dispatch_no_memory_cycler
+        return {"by_sentence": self.dispatch_memory_cycler_by_sentence,
+                "by_token": self.dispatch_memory_cycler_by_token}.get(self.memory_cycler_type,
+                                                                      self.dispatch_no_memory_cycler)
+
+    def is_over_memory_budget(self):
+        """
+        Checks whether the chat history, prompt included, has gone over max_length minus the extra budget, i.e. whether
+        memory cycling actually has anything to do. Only compares the token count kept by the handler, so nothing is
+        tokenized, and short chats (the usual case) skip memory cycling entirely.
+        :return: Whether the chat history needs to be cycled.
+        :rtype: bool
+        """
+        return self.total_tokens > self.max_length - self.extra_budget
+
+    def dispatch_no_memory_cycler(self, a_tokenizer : AutoTokenizer):
+        """
+        Does nothing, for when memory cycling is set to none (or there's no max_length to cycle down to).
+        :param: a_tokenizer:
+        :type a_tokenizer: AutoTokenizer
+        """
+        pass
+
+    def dispatch_memory_cycler_by_sentence(self, a_tokenizer : AutoTokenizer):
+        """
+        Dispatches the by_sentence memory cycler.
+        :param: a_tokenizer:
+        :type a_tokenizer: AutoTokenizer
+        """
+        if not self.is_over_memory_budget():
+            return
+        self.memory_cycle_by_sentence(self.max_length, self.chat_history, self.prompt_tensor_size, a_tokenizer,
+                                      self.extra_budget)
+
+    def dispatch_memory_cycler_by_token(self, a_tokenizer : AutoTokenizer):
+        """
+        Dispatches the by_token memory cycler.
         :param: a_tokenizer:
         :type a_tokenizer: AutoTokenizer
         """
-        if self.memory_cycler_type == "by_sentence":
-            self.memory_cycle_by_sentence(self.max_length, self.chat_history, self.prompt_tensor, a_tokenizer, self.extra_budget, )
-        elif self.memory_cycler_type == "by_token":
-            self.memory_cycle_by_token(self.max_length, self.chat_history, self.prompt_tensor, a_tokenizer, self.extra_budge)
+        # Otherwise the whole chat history would be retokenized after every message, even when nothing was cut.
+        if not self.is_over_memory_budget():
+            return
+        self.memory_cycle_by_token(self.max_length, self.chat_history, self.prompt_tensor_size, a_tokenizer,
+                                   self.extra_budget)
+        # The by_token cycler rebuilds the messages from scratch, so there's nothing to salvage from the cache.
+        self.retokenize_chat_history(a_tokenizer)
 
-    def get_encoded_chat_history(self, a_tokenizer : AutoTokenizer):
+    def dispatch_memory_cycler_in_background(self, a_tokenizer : AutoTokenizer):
+        """
+        Dispatches the memory cyclers in the background, so the caller doesn't have to wait for the cycling to finish.
+        Anything that reads or changes the chat history afterwards waits for it to be done first.
+        :param: a_tokenizer:
+        :type a_tokenizer: AutoTokenizer
+        """
+        self.wait_for_memory_cycler()
+        self.memory_cycler_future = self.memory_cycler_executor.submit(self.dispatch_memory_cycler, a_tokenizer)
+
+    def wait_for_memory_cycler(self):
+        """
+        Waits for the memory cycling running in the background, if there is any, to finish.
+        """
+        if self.memory_cycler_future is not None:
+            memory_cycler_future = self.memory_cycler_future
+            self.memory_cycler_future = None
+            # Also raises any exception the cycling ran into, just as if it wasn't run in the background.
+            memory_cycler_future.result()
+
+    def tokenize_message(self, a_message, a_tokenizer : AutoTokenizer, a_is_prompt = False):
+        """
+        Tokenizes a single message of the chat history.
+        :param a_message: The message to tokenize.
+        :type a_message: str
+        :param a_tokenizer: The tokenizer to tokenize the message with.
+        :type a_tokenizer: AutoTokenizer
+        :param a_is_prompt: Whether the message is the prompt. Only the prompt gets the tokenizer's special tokens,
+        as it's the start of the chat history, just like when the whole chat history was tokenized at once.
+        :type a_is_prompt: bool
+        :return: The token ids of the message.
+        :rtype: [int]
+        """
+        return a_tokenizer.encode(a_message, add_special_tokens=a_is_prompt)
+
+    def retokenize_chat_history(self, a_tokenizer : AutoTokenizer):
+        """
+        Tokenizes every message of the chat history again, replacing the cached token ids.
+        :param a_tokenizer: The tokenizer to tokenize the messages with.
+        :type a_tokenizer: AutoTokenizer
+        """
+        self.chat_history_token_ids = deque([self.tokenize_message(self.chat_history[0], a_tokenizer, a_is_prompt=True)])
+        # The rest of the messages are tokenized in one go, which a fast tokenizer does in parallel.
+        if len(self.chat_history) > 1:
+            self.chat_history_token_ids.extend(
+                a_tokenizer(list(itertools.islice(self.chat_history, 1, None)), add_special_tokens=False).input_ids)
+        self.total_tokens = sum(map(len, self.chat_history_token_ids))
+        self.encoded_chat_history = None
+
+    def get_encoded_chat_history(self):
         """
         Returns the tokenized chat_history in encoded base64 string.
         :description: This function primarily implements the encoding part of a technique utilized by a start-up
         named NovelAI, which tokenizes the words on the frontend and encodes to base64 as a serialization method.
-        :param: a_tokenizer
-        :type: AutoTokenizer
+        No tokenizer is needed, as every message was already tokenized when it was appended.
         :return: The base64 string of the encoded tokenized chat history
         :rtype: str
         """
         # curtosey of Antony Mercurio, who recommended me to utilize this method and giving me this code.
-        string_chat_history = ''.join(self.chat_history)
-        tokenized_chat_history = a_tokenizer.encode(string_chat_history)
-        encoded_str = front_end_utils.get_encoded_str_from_token_list(tokenized_chat_history)
-        return encoded_str
+        self.wait_for_memory_cycler()
+        # The messages are already tokenized, so all that's left is stitching their token ids together. Even that is
+        # only done when the chat history has changed since the last time.
+        if self.encoded_chat_history is None:
+            tokenized_chat_history = self.get_chat_history_token_ids()
+            self.encoded_chat_history = front_end_utils.get_encoded_str_from_token_list(tokenized_chat_history)
+        return self.encoded_chat_history
 
-    def memory_cycle_by_token(self, a_max_length, a_chat_history, a_prompt_tensor, a_tokenizer, a_extra_budget=0):
+    def get_chat_history_token_ids(self):
+        """
+        Returns the token ids of the whole chat history, stitched together from each message's cached token ids.
+        :description: As the result is a new list, it's a snapshot of the chat history that stays the same even if
+        the chat history changes afterwards. Hence, it's safe to encode in another thread.
+        :return: The token ids of the chat history.
+        :rtype: [int]
+        """
+        self.wait_for_memory_cycler()
+        if self.pending_turn is not None:
+            return list(itertools.chain(itertools.chain.from_iterable(self.chat_history_token_ids),
+                                        self.pending_turn[1]))
+        return list(itertools.chain.from_iterable(self.chat_history_token_ids))
+
+    def set_pending_turn(self, a_prefix, a_tokenizer, a_prefix_token_ids = None):
+        """
+        Sets the start of the next message, which is sent with the chat history until it's completed or discarded.
+
+        :description: Sets the start of the next message, typically someone's name followed by a colon, which tells
+        the model who it should be speaking as. Rather than appending it as a message of its own and popping it off
+        once the rest is generated, it's kept to the side, so it's only ever tokenized once and the memory cyclers
+        don't have to deal with a half finished message.
+        :param a_prefix: The start of the message.
+        :type a_prefix: str
+        :param a_tokenizer: The tokenizer to tokenize the prefix with.
+        :type a_tokenizer: AutoTokenizer
+        :param a_prefix_token_ids: The prefix's token ids, if they're already known.
+        :type a_prefix_token_ids: [int] or None
+        :return: The pending turn, to hand back to complete_pending_turn or discard_pending_turn.
+        :rtype: (str, [int])
+        """
+        self.wait_for_memory_cycler()
+        if a_prefix_token_ids is None:
+            a_prefix_token_ids = self.tokenize_message(a_prefix, a_tokenizer)
+        self.pending_turn = (a_prefix, a_prefix_token_ids)
+        self.encoded_chat_history = None
+        return self.pending_turn
+
+    def complete_pending_turn(self, a_pending_turn, a_text, a_tokenizer, a_cycle_in_background = False):
+        """
+        Appends a pending turn to the chat history, now with its generated text.
+
+        :description: Appends the pending turn's prefix alongside its generated text as one message. Only the text
+        is tokenized, the prefix's token ids are reused as is.
+        :param a_pending_turn: The pending turn returned by set_pending_turn.
+        :type a_pending_turn: (str, [int])
+        :param a_text: The generated text of the message.
+        :type a_text: str
+        :param a_tokenizer: The tokenizer to tokenize the text with.
+        :type a_tokenizer: AutoTokenizer
+        :param a_cycle_in_background: Whether to cycle through the memory in the background, rather than before
+        returning.
+        :type a_cycle_in_background: bool
+        """
+        self.discard_pending_turn(a_pending_turn)
+        prefix, prefix_token_ids = a_pending_turn
+        text = " " + a_text
+        self.append_message(prefix + text, a_tokenizer, a_cycle_through_memory=not a_cycle_in_background,
+                            a_token_ids=prefix_token_ids + self.tokenize_message(text, a_tokenizer))
+        if a_cycle_in_background:
+            self.dispatch_memory_cycler_in_background(a_tokenizer)
+
+    def discard_pending_turn(self, a_pending_turn):
+        """
+        Discards a pending turn, such as when its generation failed.
+        :param a_pending_turn: The pending turn returned by set_pending_turn.
+        :type a_pending_turn: (str, [int])
+        """
+        # Another pending turn may have been set in the meantime, which is left alone.
+        if self.pending_turn is a_pending_turn:
+            self.pending_turn = None
+            self.encoded_chat_history = None
+
+    def memory_cycle_by_token(self, a_max_length, a_chat_history, a_prompt_tensor_size, a_tokenizer, a_extra_budget=0):
         """
         Cycles through the chatbot's memory via sentence based on the size of
         its parameters. This is to perserve VRAM at the expense of the size of saving messages.
@@ -105,25 +307,26 @@ class Memory_Handler:
         :description: This function primarily cycles through the
         chatbot's memory through the use of removal of words. Does so via subtracting
 
-        :algorithm: 1. Remove the prompt. This is because we need our lengths to be precise excluding the prompt.
-        2. Encode a_chat_history into a string and get the size of it after clearing the chat history.
-        3. Double check that the prompt size is not larger than the max size. Odd to do here, but necessary as otherwise
-        the memory cycling operation is for naught.
-        4.  Get the start of where to truncate, i.e. where the prompt ends. This is done by getting the absolute
+        :algorithm: 1. Double check that the prompt size is not larger than the max size. Odd to do here, but necessary
+        as otherwise the memory cycling operation is for naught.
+        2. Check if the size of the chat history and prompt is larger than the max amount of length plus the extra budget,
+        going by the token count that's kept up to date as messages come and go. If not, there's nothing to do.
+        3. Remove the prompt. This is because we need our lengths to be precise excluding the prompt.
+        4. Stitch together the cached token ids of the chat history and get the size of it.
+        5. Get the start of where to truncate, i.e. where the prompt ends. This is done by getting the absolute
         value of the difference a_max_length prompt_tensor_size.
-        5. Get the distance from which to truncate the chat.
-        6. Check if the size of the chat history and prompt is larger than the max amount of length plus the extra budget.
-        if so, perform a tensor narrowing operation with the values mentioned in 3) and 4).
-        7. Decode the tokenized tensor and then put the truncated chat history into chat history after clearing. This
+        6. Get the distance from which to truncate the chat, and slice the token ids with the values
+        mentioned in 5) and 6).
+        7. Decode the sliced token ids and then put the truncated chat history into chat history after clearing. This
         also includes the prompt, which is always the 0th element.
 
         :param a_max_length: The maximum limit of tokens that the chat_history can be contained, see the link below:
         https://huggingface.co/docs/transformers/main_classes/text_generation#transformers.GenerationConfig.max_length
         :type a_max_length: int
-        :param a_chat_history: The  chat history in list form. The original prompt is always the 0th element.
-        :type a_chat_history: [str]
-        :param a_prompt_tensor: The prompt in tensor form. Needed mostly in such a form for size comparison purposes.
-        :type a_prompt_tensor: torch.Tensor, of varying data type.
+        :param a_chat_history: The  chat history in deque form. The original prompt is always the 0th element.
+        :type a_chat_history: deque[str]
+        :param a_prompt_tensor_size: The size of the prompt in tokens. Needed for size comparison purposes.
+        :type a_prompt_tensor_size: int
         :param: a_tokenizer: The tokenizer from which to tokenize the chat prompt.
         :param a_extra_budget: The "wiggle room" given for new tokens to generate. This is an optional safeguard so more
         words can be generated. for instance, while our chat_history might be
@@ -131,52 +334,53 @@ class Memory_Handler:
         token.
         :type a_extra_budget: int
         :return The chat history, now truncated.
-        :rtype: [str]
+        :rtype: deque[str]
         """
-        original_prompt = a_chat_history.pop(0)
-        # Turn the chat history into a string, as we'll need to encode it using our tokenizer for size comparisons.
-        chat_history_str = ''.join(a_chat_history)
-        # remove the prompt, as we'll be adding it back later.
-        # Gather the size of the chat and prompt tensors for direct comparison.
-        chat_history_tensor = a_tokenizer.encode(chat_history_str, return_tensors="pt")
-        chat_history_tensor_size = chat_history_tensor.size(dim=1)
-        prompt_tensor_size = a_prompt_tensor.size(dim=1)
 
         # In the case that the prompt is larger than our max_limit, greatly warn the user. There's no way we can
         # fix this, as in essence, the prompt would be the main force in driving a character's personality. To lose
         # it is to lose data crucial to be fed to the model.
-        if prompt_tensor_size > a_max_length:
+        if a_prompt_tensor_size > a_max_length:
             logging.critical(
                 "Your prompt is larger than your largest max length. Please increase your max_length parameter in "
                 "your settings!")
 
 
-        # Does the math for the start and end of what should be the acceptable bounds for the new shortened chat history.
-        # Determined mostly by the size of the chat history and the max length. Max length can be analogous to context
-        # length in this case.
-        start_of_truncated_history = abs(a_max_length - prompt_tensor_size)
-        distance_for_truncated_history = chat_history_tensor_size - start_of_truncated_history
-        a_chat_history.clear()
+        # The token count already includes the prompt, so no need to tokenize anything to know if there's anything
+        # to truncate. Clearing only happens past this point, so a chat history that fits is left as is.
+        if self.total_tokens > a_max_length - a_extra_budget:
+            # remove the prompt, as we'll be adding it back later.
+            original_prompt = a_chat_history.popleft()
+            # The messages are already tokenized, so their token ids just need stitching together, skipping the
+            # prompt's.
+            chat_history_token_ids = list(itertools.chain.from_iterable(
+                itertools.islice(self.chat_history_token_ids, 1, None)))
+            chat_history_tensor_size = len(chat_history_token_ids)
 
+            # Does the math for the start and end of what should be the acceptable bounds for the new shortened chat
+            # history. Determined mostly by the size of the chat history and the max length. Max length can be
+            # analogous to context length in this case.
+            start_of_truncated_history = abs(a_max_length - a_prompt_tensor_size)
+            distance_for_truncated_history = chat_history_tensor_size - start_of_truncated_history
+            a_chat_history.clear()
 
-        if chat_history_tensor_size + prompt_tensor_size > a_max_length - a_extra_budget:
-            # Truncates the chat history utilizing a tensor narrowing operation (i.e. reducing the dimensions),
-            # aka getting rid of tokens in the tensor.
-            truncated_chat_history_tensor = torch.narrow(chat_history_tensor, 1, start_of_truncated_history,
-                                                         distance_for_truncated_history)
-            decoded_truncated_messages = a_tokenizer.batch_decode(truncated_chat_history_tensor, skip_special_tokens=True)
+            # Truncates the chat history utilizing a plain list slice, aka getting rid of tokens in the list. No need
+            # for a tensor, as it's decoded straight back into text.
+            truncated_chat_history_token_ids = chat_history_token_ids[
+                start_of_truncated_history:start_of_truncated_history + distance_for_truncated_history]
+            decoded_truncated_messages = a_tokenizer.decode(truncated_chat_history_token_ids, skip_special_tokens=True)
             # Necessary as each chat messages is divided by a new line. For instance,
             # The chat will always look something similar to the following:
             # User: Hello. \n Bot: Hi. \n
-            # The chat_history list will always look something similar to chat, hence the split.
-            a_chat_history.extend(decoded_truncated_messages[0].split('\n'))
-        a_chat_history.insert(0, original_prompt)
+            # The chat_history deque will always look something similar to chat, hence the split.
+            a_chat_history.extend(decoded_truncated_messages.split('\n'))
+            a_chat_history.appendleft(original_prompt)
         return a_chat_history
 
-    def memory_cycle_by_sentence(self, a_max_length, a_chat_history, a_prompt_tensor, a_tokenizer, a_extra_budget=0):
+    def memory_cycle_by_sentence(self, a_max_length, a_chat_history, a_prompt_tensor_size, a_tokenizer, a_extra_budget=0):
         """
         Cycles through the chatbot's memory via sentence based on the size of
-        a_chat_history, a_max_limit, and a_prompt_tensor.
+        a_chat_history, a_max_limit, and a_prompt_tensor_size.
 
         :description: This function primarily cycles through the
         chatbot's memory through the use of removal of sentences, as seen in earlier functions. It does so by first
@@ -186,29 +390,25 @@ class Memory_Handler:
         of the prompt being bigger than the entire max_limit, the program exits. (This is mostly in case the user
         changes the max_limit settings, that the quota of max size is met).
 
-        1. Remove the prompt, as we'll need to make sure to re-add it later, but we don't want the prompt to mess up
-        the length calculations.
-        2. Encode a_chat_history into a string and get the size of it after clearing the chat history.
-        3. Double check that the prompt size is not larger than the max size. Odd to do here, but necessary as otherwise
+        1. Remove the prompt, as we'll need to make sure to re-add it later, but we don't want to pop the prompt.
+        2. Double check that the prompt size is not larger than the max size. Odd to do here, but necessary as otherwise
         the memory cycling operation is for naught.
-        4. Get the start of where to truncate, i.e. where the prompt ends. This is done by getting the absolute
-        value of the difference a_max_length prompt_tensor_size.
-        5. Check if the size of the chat history and prompt is larger than the max amount of length plus the extra budget.
-        if so, continually pop from the list (oldest messages go first)
-        6. Decode the tokenized tensor and then put the truncated chat history into chat history after clearing.
-        7. Retensorize the chat history for checking sizes, as this function will be done continually.
-        8. Re-add the prompt.
+        3. Check if the size of the chat history and prompt is larger than the max amount of length plus the extra budget.
+        if so, continually pop from the front of the deque (oldest messages go first), alongside their cached token ids.
+        4. Subtract the popped message's token count from the total, as the token count of each message is already
+        known, so nothing needs to be tokenized again.
+        5. Re-add the prompt.
 
         :param a_max_length: The maximum limit of
         tokens that the chat_history can be contained,see below for more:
         https://huggingface.co/docs/transformers/main_classes/text_generation#transformers.GenerationConfig.max_length
         :type a_max_length: int
-        :param a_chat_history: The chat history in list form. The original prompt is always the
+        :param a_chat_history: The chat history in deque form. The original prompt is always the
         0th element.
-        :type a_chat_history: [str]
-        :param a_prompt_tensor: The prompt in tensor form. Needed mostly in such a form for size
+        :type a_chat_history: deque[str]
+        :param a_prompt_tensor_size: The size of the prompt in tokens. Needed for size
         comparison purposes.
-        :type a_prompt_tensor: torch.Tensor, of varying data type.
+        :type a_prompt_tensor_size: int
         :param: a_tokenizer: The tokenizer to encode the prompt.
         :type: AutoTokenizer
         :param a_extra_budget: The "wiggle room" given for new tokens to generate. This is an
@@ -216,34 +416,27 @@ class Memory_Handler:
         199 whereas our max_limit is 200, the chatbot may struggle since it can only generate 1 more token.
         :type a_extra_budget: int
         :return The chat history, now truncated.
-        :rtype [str]
+        :rtype deque[str]
         """
 
         # remove the prompt, as we'll be adding it back later.
-        original_prompt = a_chat_history.pop(0)
-        # Turn the chat history into a string, as we'll need to encode it using our tokenizer for size comparisons.
-        chat_history_str = ''.join(a_chat_history)
-        # Gather the size of the chat and prompt tensors for direct comparison.
-        chat_history_tensor = a_tokenizer.encode(chat_history_str, return_tensors="pt")
-        chat_history_tensor_size = chat_history_tensor.size(dim=1)
-        prompt_tensor_size = a_prompt_tensor.size(dim=1)
-        # Left behind variable. May need for something else, I just have a gut feeling thus far, so hence why it's
-        # not removed just yet... chat_history_excluding_prompt_size = chat_history_tensor_size - prompt_tensor_size
+        original_prompt = a_chat_history.popleft()
+        original_prompt_token_ids = self.chat_history_token_ids.popleft()
 
         # In the case that the prompt is larger than our max_limit, greatly warn the user. There's no way we can
         # fix this, as in essence, the prompt would be the main force in driving a character's personality. To lose
         # it is to lose data crucial to be fed to the model.
-        if prompt_tensor_size > a_max_length:
+        if a_prompt_tensor_size > a_max_length:
             logging.critical(
                 "Your prompt is larger than your largest max limit. Please increase your max_limit parameter in your "
                 "settings!")
 
         # Continually loop until the chat history's size is less than difference between the max amount of tokens and
         # extra wiggle room provided for generation. Each time, the sizes are updated, and gradually, each oldest
-        # part of the conversation history is removed.
-        while chat_history_tensor_size + prompt_tensor_size > a_max_length - a_extra_budget and len(a_chat_history) > 0:
+        # part of the conversation history is removed. The total already includes the prompt.
+        while self.total_tokens > a_max_length - a_extra_budget and len(a_chat_history) > 0:
             # As we're using append, the question and response will always be the second last elements of the
-            # chat_history list.
+            # chat_history deque.
             if (len(a_chat_history) == 2):
                 print(
                     "WARNING: Your most recent message to the bot has been trimmed in short term memory! Consider "
@@ -252,19 +445,15 @@ class Memory_Handler:
                 print(
                     "WARNING: The chatbot's most recent message has been trimmed in short term memory! Consider "
                     "increasing the max_limit parameter or lowering the extra_budget parameter.")
-            a_chat_history.pop(0)
-            chat_history_str = ''.join(a_chat_history)
-            chat_history_tensor = a_tokenizer.encode(chat_history_str, return_tensors="pt")
-            chat_history_tensor_size = chat_history_tensor.size(dim=1)
-            prompt_tensor_size = a_prompt_tensor.size(dim=1)
-            # Left behind variable. May need for something else, I just have a gut feeling thus far, so hence why
-            # it's not removed just yet... chat_history_excluding_prompt_size = chat_history_tensor_size -
-            # prompt_tensor_size
-
-        a_chat_history.insert(0, original_prompt)
+            a_chat_history.popleft()
+            self.total_tokens -= len(self.chat_history_token_ids.popleft())
+            self.encoded_chat_history = None
+
+        a_chat_history.appendleft(original_prompt)
+        self.chat_history_token_ids.appendleft(original_prompt_token_ids)
         return a_chat_history
 
-    def append_message(self, a_message, a_tokenizer, a_cycle_through_memory = True):
+    def append_message(self, a_message, a_tokenizer, a_cycle_through_memory = True, a_token_ids = None):
         """
 
         :name append_message: appends a message to the chat history and ensures it does not go over the memory limit.
@@ -274,23 +463,80 @@ class Memory_Handler:
         :type a_tokenizer: AutoTokenizer
         :param a_cycle_through_memory: Whether to cycle to through the memory.
         :type a_cycle_through_memory: str
+        :param a_token_ids: The message's token ids, if they're already known. Saves tokenizing messages that are
+        appended over and over, like the bot's name.
+        :type a_token_ids: [int] or None
+        """
+        self.wait_for_memory_cycler()
+        self.record_message(a_message, a_tokenizer, a_cycle_through_memory, a_token_ids)
+
+    def append_message_in_background(self, a_message, a_tokenizer):
+        """
+        Appends a message to the chat history and cycles through the memory in the background, so the caller doesn't
+        have to wait for the message to be tokenized either. Anything that reads or changes the chat history
+        afterwards waits for it to be done first.
+        :param a_message: the message to append to the chat history.
+        :type a_message: str
+        :param a_tokenizer: The tokenizer to help encode the prompt.
+        :type a_tokenizer: AutoTokenizer
+        """
+        self.wait_for_memory_cycler()
+        self.memory_cycler_future = self.memory_cycler_executor.submit(self.record_message, a_message, a_tokenizer)
+
+    def record_message(self, a_message, a_tokenizer, a_cycle_through_memory = True, a_token_ids = None):
+        """
+        Does the actual appending for append_message and append_message_in_background. Doesn't wait for the memory
+        cycler, as when run in the background, it IS what's being waited for.
+        :param a_message: the message to append to the chat history.
+        :type a_message: str
+        :param a_tokenizer: The tokenizer to help encode the prompt.
+        :type a_tokenizer: AutoTokenizer
+        :param a_cycle_through_memory: Whether to cycle to through the memory.
+        :type a_cycle_through_memory: bool
+        :param a_token_ids: The message's token ids, if they're already known.
+        :type a_token_ids: [int] or None
         """
         self.chat_history.append(a_message)
+        if a_token_ids is None:
+            a_token_ids = self.tokenize_message(a_message, a_tokenizer)
+        self.chat_history_token_ids.append(a_token_ids)
+        self.total_tokens += len(a_token_ids)
+        self.encoded_chat_history = None
         if a_cycle_through_memory:
             self.dispatch_memory_cycler(a_tokenizer)
+
     def clear_all_memories(self):
         """
         Clears the chat history, thus, wiping out all memories of the chat bot.
         """
+        self.wait_for_memory_cycler()
         self.chat_history.clear()
         self.chat_history.append(self.prompt)
+        self.chat_history_token_ids.clear()
+        self.chat_history_token_ids.append(self.prompt_tensor[0].tolist())
+        self.total_tokens = len(self.chat_history_token_ids[0])
+        self.pending_turn = None
+        self.encoded_chat_history = None
     def pop_memory(self, a_index = -1):
         """
-        A sort of 'proxy' function that calls the pop function of a list specifically for
-        self.chat_history. Mostly as the pop syntax looks ugly by itself.
+        A sort of 'proxy' function that calls the pop function of a deque specifically for
+        self.chat_history. Mostly as the pop syntax looks ugly by itself. Popping from either end is O(1), while
+        popping from the middle still works, albeit slower.
         :param a_index: the index of the chat_history from which to pop.
         :type a_index: int
         :return: The popped message from the chat history.
         :rtype: str
         """
-        return self.chat_history.pop(a_index)
+        self.wait_for_memory_cycler()
+        self.encoded_chat_history = None
+        if a_index == -1:
+            self.total_tokens -= len(self.chat_history_token_ids.pop())
+            return self.chat_history.pop()
+        if a_index == 0:
+            self.total_tokens -= len(self.chat_history_token_ids.popleft())
+            return self.chat_history.popleft()
+        popped_message = self.chat_history[a_index]
+        del self.chat_history[a_index]
+        self.total_tokens -= len(self.chat_history_token_ids[a_index])
+        del self.chat_history_token_ids[a_index]
+        return popped_message
@@ -1,9 +1,16 @@
+import asyncio
 import sys
 
 import settings_handler
 import terminal_provider
 import discord_provider
 import logging
+
+# uvloop is an optional, faster replacement for asyncio's event loop. It doesn't support Windows, hence the fallback.
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
 def main():
     """
     The main driver of the front-end. Organizes Front End Providers alongside config settings.
@@ -13,12 +20,18 @@ def main():
     3. If there's too many or too little command line arguments, log errors.
     """
     if len(sys.argv)==2:
-        settings_class = settings_handler.Settings_Handler(sys.argv[1])
+        try:
+            settings_class = settings_handler.Settings_Handler(sys.argv[1])
+        except settings_handler.ConfigError as config_exception:
+            logging.error(config_exception)
+            sys.exit(-1)
         if settings_class.settings['provider_settings']['provider_type'] == "terminal":
             terminal = terminal_provider.Terminal_Provider(settings_class)
             terminal.chat()
         elif settings_class.settings['provider_settings']['provider_type'] == "discord":
             discord_frontend = discord_provider.Discord_Provider(settings_class)
+            if uvloop is not None:
+                asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
             try:
                 discord_frontend.run(token=discord_frontend.token)
             except Exception as discord_login_exception:
@@ -1,12 +1,23 @@
 import sys
 
+import front_end_utils
 import memory_handler
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
 import logging
 
 import settings_handler
 
 
+# What to log for the HTTP status codes the backend is known to send back when generation fails. Any other status code
+# is logged as unknown.
+HTTP_GENERATION_ERROR_LOGS = {
+    400: "There was an error with the client during generation.",
+    500: "There was an error with the server during generation."
+}
+
+
 class Provider:
     """
     The Base Abstract class for Providers. This defines basic provider before, like loading settings that both the
@@ -24,18 +35,35 @@ class Provider:
         self.memories = memory_handler.Memory_Handler(a_settings_handler)
         self.generation_args = a_settings_handler.retrieve_consolidated_generation_settings()
         self.tokenizer = a_settings_handler.tokenizer
+        # Words already tokenized by tokenize_single_token, as the same word tends to be biased over and over.
+        self.single_token_cache = {}
+        # One session for every request to the backend, so its connection is kept alive and reused rather than a new
+        # one being opened (and for remote backends, a new TLS handshake done) for every single generation.
+        self.backend_session = requests.Session()
+        # There's only ever the one backend, but the Discord provider can have several generations going at once, each
+        # from its own thread. Keeps enough connections around for all of them, rather than dropping the extras.
+        backend_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+        self.backend_session.mount("http://", backend_adapter)
+        self.backend_session.mount("https://", backend_adapter)
+        # Every request body is serialized with orjson rather than through requests' json argument, so the header
+        # requests would've set has to be set here instead.
+        self.backend_session.headers["Content-Type"] = "application/json"
         load_settings = {
             "device": self.memories.device,
             "model_settings": a_settings_handler.settings['model_settings']
         }
         self.serial_settings = {
             "chat_history": None,
-            "experimental_settings": a_settings_handler.settings['experimental_settings'] if 'experimental_settings' in
-                                                                                             a_settings_handler.settings.keys() else None,
+            "experimental_settings": a_settings_handler.settings.get('experimental_settings'),
             "generation_settings": self.generation_args,
             "device": self.memories.device
         }
+        # The serialized settings, excluding the chat history, as they only change through change_settings.
+        self.serialized_settings_prefix = ""
+        self.serialized_settings_prefix_without_experimental = ""
+        self.cache_serialized_settings()
         self.request_load(load_settings)
+        self.request_warmup()
 
     def tokenize_single_token(self, a_str: str):
         """
@@ -47,13 +75,64 @@ class Provider:
         :return: The tokenized str.
         :type: int
         """
+        if a_str in self.single_token_cache:
+            return self.single_token_cache[a_str]
         tokenized_word_list = self.tokenizer.encode(a_str)
         if len(tokenized_word_list) > 1:
             raise ValueError("Cannot apply logit bias processor with more than 1 token!")
         else:
             tokenized_word = tokenized_word_list[0]
+            self.single_token_cache[a_str] = tokenized_word
             return tokenized_word
 
+    def cache_serialized_settings(self):
+        """
+        Serializes all the serial settings except for the chat history ahead of time.
+
+        :description: The chat history is the only setting that changes every message, so the rest of the settings
+        are only serialized once here (and again whenever they are changed), rather than for every message. The
+        closing brace is left off so the chat history can be spliced on the end. Also caches a version without the
+        experimental settings for the Discord provider's autocomplete. orjson is used over json as it's several times
+        faster.
+        """
+        static_settings = {key: value for key, value in self.serial_settings.items() if key != "chat_history"}
+        self.serialized_settings_prefix = orjson.dumps(static_settings).decode("utf-8")[:-1]
+        static_settings.pop("experimental_settings", None)
+        self.serialized_settings_prefix_without_experimental = orjson.dumps(static_settings).decode("utf-8")[:-1]
+
+    def serialize_settings(self, a_chat_history: str, a_include_experimental_settings: bool = True):
+        """
+        Serializes the serial settings alongside the passed chat history. Only the chat history is actually serialized
+        here, as the rest are cached by cache_serialized_settings.
+
+        :param a_chat_history: The encoded chat history to send.
+        :type a_chat_history: str
+        :param a_include_experimental_settings: Whether to include the experimental settings.
+        :type a_include_experimental_settings: bool
+        :return: The serial settings in json string form.
+        :rtype: str
+        """
+        if a_include_experimental_settings:
+            prefix = self.serialized_settings_prefix
+        else:
+            prefix = self.serialized_settings_prefix_without_experimental
+        # An empty prefix is just "{", in which case there's nothing to separate the chat history from.
+        separator = "," if len(prefix) > 1 else ""
+        return f'{prefix}{separator}"chat_history":{orjson.dumps(a_chat_history).decode("utf-8")}}}'
+
+    def decode_bot_response(self, a_bot_response):
+        """
+        Decodes a successful response from the backend straight into the generated message, i.e. decodes it from
+        base64 and detokenizes it in one go.
+
+        :param a_bot_response: The encoded base64 string sent back from the backend.
+        :type a_bot_response: str
+        :return: The generated message.
+        :rtype: str
+        """
+        return self.tokenizer.decode(front_end_utils.decode_encoded_tokenized_tensor(a_bot_response)[0],
+                                     skip_special_tokens=True)
+
     def detokenize_decoded_message(self, a_list_of_decoded_tokens: [[int]]):
         """
         Detokenize_decoded_message- detokenize a list of tokens, and translates them into a message.
@@ -72,7 +151,7 @@ class Provider:
         :type: dict
         """
         try:
-            requests.post(self.backend_url + "/load", json=a_load_settings)
+            self.backend_session.post(self.backend_url + "/load", data=orjson.dumps(a_load_settings))
         except Exception as load_exception:
             logging.error("There was an error in loading the model. This program cannot run without a model. Also, \n"
                           "a common error is forgetting to add http:// to your url, so is forgetting to port forward \n"
@@ -81,10 +160,34 @@ class Provider:
                           "Please check the following error log:")
             logging.exception(load_exception)
             sys.exit(-1)
+    def request_warmup(self):
+        """
+        Sends a throwaway request to generate a single token, so the backend is warmed up before the first message.
+
+        :description: The first generation after loading a model is by far the slowest, as the backend still has to
+        set everything up on the device, i.e. allocate memory and pick the CUDA kernels. Doing that here, while the
+        program is starting anyways, means the user doesn't have to wait on it for their first message. Only a single
+        token of the prompt is sent and a single token generated, so the warmup itself is quick.
+        """
+        # max_new_tokens overrides max_length anyways, but leaving both in makes transformers complain.
+        warmup_generation_args = {key: value for key, value in self.generation_args.items() if key != "max_length"}
+        warmup_generation_args["max_new_tokens"] = 1
+        # The last token of the prompt, which is always at the start of the chat history.
+        warmup_chat_history = front_end_utils.get_encoded_str_from_token_list(self.memories.chat_history_token_ids[0][-1:])
+        warmup_settings = {
+            "chat_history": warmup_chat_history,
+            "experimental_settings": self.serial_settings["experimental_settings"],
+            "generation_settings": warmup_generation_args,
+            "device": self.memories.device
+        }
+        # The reply is of no use, and any errors are already logged by request_generation.
+        self.request_generation(orjson.dumps(warmup_settings).decode("utf-8"))
+
     def request_generation(self, a_serial_settings = None):
         """
         Sends a request to generate text from the model loaded on the backend server. If unsuccessful, return int
-        relating to status or an arbitrary error code.
+        relating to status or an arbitrary error code, i.e. 0 on timeout, -1 for other request errors, -2 for any
+        other error, and -3 for an HTTP error without a status code.
         :param a_serial_settings: The settings relating to serialization.
         :type: None, if passed, typically dict
         :return:
@@ -97,20 +200,18 @@ class Provider:
             a_serial_settings = self.serial_settings
 
         try:
-            bot_response = requests.post(self.backend_url + "/generate", json=a_serial_settings)
-            json_bot_response = bot_response.json()
+            bot_response = self.backend_session.post(self.backend_url + "/generate", data=orjson.dumps(a_serial_settings))
             # https://stackoverflow.com/questions/16511337/correct-way-to-try-except-using-python-requests-module
+            # Checked before parsing, as an error page usually isn't json, and parsing it would hide the status code.
             bot_response.raise_for_status()
-            return json_bot_response
+            return orjson.loads(bot_response.content)
         except requests.exceptions.HTTPError as http_exception:
-            if http_exception.code == 400:
-                logging.error("There was an error with the client during generation. "+log_msg)
-            elif http_exception.code == 500:
-                logging.error("There was an error with the server during generation."+log_msg)
-            else:
-                logging.error("Unknown HTTP generation error."+log_msg)
+            # HTTPError has no status code of its own, it's on the response. A response is falsy when it's an error,
+            # hence checking against None.
+            status_code = http_exception.response.status_code if http_exception.response is not None else None
+            logging.error(HTTP_GENERATION_ERROR_LOGS.get(status_code, "Unknown HTTP generation error.") + log_msg)
             logging.exception(http_exception)
-            return http_exception.code
+            return status_code if status_code is not None else -3
         except requests.exceptions.Timeout as timeout_exception:
             logging.error("The connection timed out."+log_msg)
             logging.exception(timeout_exception)
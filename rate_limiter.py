@@ -0,0 +1,63 @@
+import asyncio
+import time
+
+
+class Token_Bucket:
+    """
+    An asyncio friendly token bucket. Paces requests to rate limited endpoints, such as Discord's webhooks, so that
+    bursts of requests wait their turn on the client instead of being rejected by the server with a 429.
+    """
+    def __init__(self, a_rate: int = 5, a_per: float = 5.0):
+        """
+        The ctor for the Token_Bucket class.
+        :param a_rate: The amount of requests allowed per a_per seconds. Discord's webhooks allow 5 every 5 seconds.
+        :type a_rate: int
+        :param a_per: The length in seconds of the window a_rate applies to.
+        :type a_per: float
+        """
+        self.rate = a_rate
+        self.per = a_per
+        self.tokens = float(a_rate)
+        self.last_refill = time.monotonic()
+        # When the server says the bucket is empty, no requests are sent until this (monotonic) time.
+        self.blocked_until = 0.0
+        self.lock = asyncio.Lock()
+
+    def refill(self):
+        """
+        Adds the tokens earned since the last refill, capped at the bucket's rate.
+        """
+        now = time.monotonic()
+        self.tokens = min(float(self.rate), self.tokens + (now - self.last_refill) * self.rate / self.per)
+        self.last_refill = now
+
+    async def acquire(self):
+        """
+        Waits until a request is allowed to be sent, then takes a token from the bucket.
+
+        :description: The lock makes sure that concurrent waiters take tokens one at a time, in the order they came in.
+        """
+        async with self.lock:
+            delay = self.blocked_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) * self.per / self.rate)
+                self.refill()
+            self.tokens -= 1
+
+    def update_from_headers(self, a_headers):
+        """
+        Syncs the bucket with the rate limit headers the server sent back, as the server's count is the real one.
+
+        :param a_headers: The headers of the response. Typically, aiohttp's case-insensitive header dict.
+        """
+        remaining = a_headers.get("X-RateLimit-Remaining")
+        reset_after = a_headers.get("X-RateLimit-Reset-After")
+        if remaining is None or reset_after is None:
+            return
+        self.refill()
+        self.tokens = min(self.tokens, float(remaining))
+        if self.tokens < 1:
+            self.blocked_until = time.monotonic() + float(reset_after)
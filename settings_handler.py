@@ -1,11 +1,30 @@
-import json
+import orjson
 import torch
 import front_end_utils
 from transformers import PreTrainedModel, PreTrainedTokenizer
 from transformers import AutoModelForCausalLM, AutoTokenizer, GPTNeoForCausalLM
-import sys
 import logging
 import warnings
+from pathlib import Path
+
+
+# The settings groups, settings, and discord specific settings that the program can't run without.
+VITAL_SETTINGS_GROUPS = frozenset({"model_settings", "tokenizer_settings", "generation_settings", "input_settings",
+                                   "provider_settings"})
+VITAL_SETTINGS = frozenset({"prompt", "tokenizer", "model", "device", "provider_type", "bot_name", "user_name",
+                            "max_length"})
+# The main guild is optional, without it the slash commands are synced globally instead.
+VITAL_DISCORD_SETTINGS = frozenset({"token"})
+
+
+class ConfigError(Exception):
+    """
+    Raised when the json config file can't be read, or is missing or has invalid settings. Raised rather than exiting
+    outright, so whatever is using the Settings_Handler decides what to do about it.
+    """
+    pass
+
+
 class Settings_Handler:
     """
     Handles/prepares the settings from the config json file for use by the provider classes.
@@ -15,16 +34,20 @@ class Settings_Handler:
         """
         Ctor for the Settings_Handler class. Reads settings from a json file.
         :param json_file_name: The name of the json file. To be put into the designated config folder.
+        :raises ConfigError: If the json file can't be read, or if any of its settings are missing or invalid.
         """
         if json_file_name is not None:
             try:
-                config_file = open("config/"+json_file_name, encoding="utf8")
+                # Read as bytes, as orjson parses those directly. read_bytes also closes the file straight away, even
+                # if reading it fails.
+                self.settings = orjson.loads((Path("config") / json_file_name).read_bytes())
             except Exception as json_exception:
-                logging.error("There was an error while trying to open your configuration file. Ensure you have the "
-                              "right path?")
                 logging.exception(json_exception)
-            self.settings = json.load(config_file)
+                raise ConfigError("There was an error while trying to open or read your configuration file. Ensure you "
+                                  "have the right path, and that it's valid json?") from json_exception
             self.tokenizer = None
+            # The tokenized prompt. Kept from checking its size, so the memory handler doesn't tokenize it again.
+            self.prompt_tensor = None
 
             # Preliminary Basic Checks, i.e. absolutely essential settings.
             self.verify_settings_group_existence()
@@ -39,48 +62,47 @@ class Settings_Handler:
             # Preparation of Experimental Processors
             self.replace_biased_tokens()
 
-            config_file.close()
+            # The generation settings don't change past this point, so they're only merged the once.
+            self.consolidated_generation_settings = {**self.settings["generation_settings"]["sampler_settings"],
+                                                     **self.settings["generation_settings"]["syntax_settings"]}
         else:
-            print("No json config file sent!")
-            sys.exit(-1)
+            raise ConfigError("No json config file sent!")
     def concatenate_prompts(self):
         """
         Concatenates the example conversation alongside the prompt. The prompt in this case would just be the bot's
         description prior to concatenation.
         """
-        if 'example_conversation' in self.settings['input_settings'].keys():
-            self.settings['input_settings']['prompt'] += self.settings['input_settings']['example_conversation']
+        input_settings = self.settings['input_settings']
+        if 'example_conversation' in input_settings:
+            # Joined into a new string in one go, rather than the prompt being concatenated onto in place.
+            input_settings['prompt'] = "".join((input_settings['prompt'], input_settings['example_conversation']))
 
     def verify_settings_group_existence(self):
         """
         Verifies if certain essential settings groups exist i.e. settings related to the model, tokenizer, etc..
         """
-        vital_settings_group_list = ["model_settings", "tokenizer_settings", "generation_settings", "input_settings", "provider_settings"]
-        for vital_settings_group in vital_settings_group_list:
-            if not(vital_settings_group in self.settings):
-                logging.error(f"No {vital_settings_group} group provided! Check your json config file. This settings group is necessary.")
-                sys.exit(-1)
+        # Every missing group is reported at once, rather than only the first one found.
+        missing_settings_groups = VITAL_SETTINGS_GROUPS - self.settings.keys()
+        if missing_settings_groups:
+            raise ConfigError("\n".join(
+                f"No {vital_settings_group} group provided! Check your json config file. This settings group is necessary."
+                for vital_settings_group in sorted(missing_settings_groups)))
     def verify_settings_existence(self):
         """
         Verifies if certain essential settings exist. I.e. the model, the device, etc..
         """
-        vital_settings_list = ["prompt", "tokenizer", "model", "device", "provider_type", "bot_name", "user_name", "max_length"]
-
-        flattened_dict = front_end_utils.flatten_nested_dictionary(self.settings)
-        for vital_setting in vital_settings_list:
-            if not (vital_setting in flattened_dict):
-                logging.error(
-                    f"No {vital_setting} setting provided! Check your json config file for this missing key or check "
-                    f"if its corrupted. This setting is necessary.")
-                sys.exit(-1)
-        if self.settings["provider_settings"] == "discord":
-            necessary_discord_settings_list = ["token", "main_guild_id"]
-            for vital_setting in necessary_discord_settings_list:
-                if not (vital_setting in flattened_dict):
-                    logging.error(
-                        f"No {vital_setting} setting provided! Check your json config file for this missing key or "
-                        f"check if its corrupted. This setting is necessary. since you're using discord as a provider type.")
-                    sys.exit(-1)
+        # Collected once and reused by both checks, rather than flattening the whole config just to look up keys.
+        setting_keys = front_end_utils.collect_setting_keys(self.settings)
+        error_msgs = [f"No {vital_setting} setting provided! Check your json config file for this missing key or check "
+                      f"if its corrupted. This setting is necessary."
+                      for vital_setting in sorted(VITAL_SETTINGS - setting_keys)]
+        # Missing discord settings are reported as well, so they're all known at once.
+        if self.settings["provider_settings"].get("provider_type") == "discord":
+            error_msgs.extend(f"No {vital_setting} setting provided! Check your json config file for this missing key or "
+                              f"check if its corrupted. This setting is necessary. since you're using discord as a "
+                              f"provider type." for vital_setting in sorted(VITAL_DISCORD_SETTINGS - setting_keys))
+        if error_msgs:
+            raise ConfigError("\n".join(error_msgs))
     def translate_tokenizer_and_model(self):
         """
         Translates the 'model' and 'tokenizer' args in settings such that it turns
@@ -106,6 +128,10 @@ class Settings_Handler:
             print("You didn't set a eos_token_id, so auto setting it to 198 (newline)...")
             self.settings['model_settings']["eos_token_id"] = 198
 
+        # Has the backend load the weights straight in rather than first initializing every layer randomly, only to
+        # overwrite it all with the pretrained weights anyway. Makes loading a lot faster and uses less RAM doing so.
+        self.settings['model_settings'].setdefault("low_cpu_mem_usage", True)
+
         if not("memory_cycler" in self.settings['netherworld_settings']):
             print("You didn't set the memory cycler, defaulting to none.")
             self.settings["memory_cycler"] = "none"
@@ -121,28 +147,28 @@ class Settings_Handler:
         Tokenizes the bad words that are in the settings. Necessary, as the backend expects them to be in a tokenized
         format.
         """
-        if 'bad_words_ids' in self.settings['generation_settings']['syntax_settings'].keys():
+        if 'bad_words_ids' in self.settings['generation_settings']['syntax_settings']:
             self.settings['generation_settings']['syntax_settings']['bad_words_ids'] = \
                 self.tokenizer(self.settings['generation_settings']['syntax_settings']['bad_words_ids'], add_special_tokens=False).input_ids
     def check_if_prompt_larger_than_max(self):
         """
         Checks if the prompt is larger than the max_length parameter to avoid
-        undefined behavior. Exit if that is the case, as the program is just starting to run.
+        undefined behavior. Raise a ConfigError if that is the case, as the program is just starting to run.
         """
-        prompt_tensor = self.tokenizer.encode(self.settings['input_settings']['prompt'], return_tensors="pt")
-        prompt_tensor_size = prompt_tensor.size(dim=1)
+        self.prompt_tensor = self.tokenizer.encode(self.settings['input_settings']['prompt'], return_tensors="pt")
+        prompt_tensor_size = self.prompt_tensor.size(dim=1)
         if prompt_tensor_size > self.settings['generation_settings']['syntax_settings']['max_length']:
-            print("You cannot make a prompt larger than your maximum limit! Increase max_length or shorten your prompt!")
-            exit(-1)
+            raise ConfigError("You cannot make a prompt larger than your maximum limit! Increase max_length or shorten "
+                              "your prompt!")
     def retrieve_consolidated_generation_settings(self):
         """
         Returns the merged list of generation settings, including both
-        syntax and sampler related settings.
+        syntax and sampler related settings. These are merged once in the ctor, so the same dict is returned every time.
         :return: The two aforementioned sub-dicts, now merged.
         :rtype: dict
         :acknowledgements - adapted from https://www.geeksforgeeks.org/python-merging-two-dictionaries/
         """
-        return {**self.settings["generation_settings"]["sampler_settings"], **self.settings["generation_settings"]["syntax_settings"]}
+        return self.consolidated_generation_settings
 
     def load_tokenizer_settings(self):
         """
@@ -157,6 +183,11 @@ class Settings_Handler:
         if self.tokenizer is None:
             self.translate_tokenizer_and_model()
             self.tokenizer = AutoTokenizer.from_pretrained(**(self.settings["tokenizer_settings"]))
+            # Every message gets tokenized as it comes in, so the slow, pure Python tokenizers really show. Transformers
+            # already picks the fast (Rust) one whenever the model has one, unless use_fast is set to false.
+            if not self.tokenizer.is_fast:
+                logging.warning("Your tokenizer is a slow, pure Python tokenizer. If your model has a fast tokenizer, "
+                                "don't set use_fast to false in your tokenizer_settings.")
             self.set_default_settings()
             self.check_if_prompt_larger_than_max()
             print("Tokenizer loaded.")
@@ -172,24 +203,23 @@ class Settings_Handler:
         have one token at a time as the experimental sampler logit_bias only biases one token at a time.
         However, the process of preparing it is rather difficult since the process involves going through several nestings.
         """
-        if 'experimental_settings' in self.settings.keys() and 'experimental_processors' in self.settings['experimental_settings'].keys():
+        if 'experimental_settings' in self.settings and 'experimental_processors' in self.settings['experimental_settings']:
             # checks which type of experimental processor there is
             for processor, processor_values in self.settings['experimental_settings']['experimental_processors'].items():
-                if processor == "logit_bias":
-                    # Used for indexing. Maybe rename to itr later?
-                    count = 0
-                    # The original function expects a list of tuples, which are in essence pairs, so hence why
-                    # I used keys and values here.
-                    for word, bias in dict(processor_values).items():
-                        tokenized_word_list = self.tokenizer.encode(word)
-                        tokenized_word = 0
-                        if len(tokenized_word_list) > 1:
+                if processor == "logit_bias" and processor_values:
+                    # The original function expects a list of tuples, which are in essence pairs. The words to bias can
+                    # be given either as such pairs, or as a dict of words and their biases.
+                    word_biases = processor_values.items() if isinstance(processor_values, dict) else processor_values
+                    # All the words are tokenized in one go, which is a lot faster than tokenizing them one by one.
+                    tokenized_word_lists = self.tokenizer([word for word, bias in word_biases],
+                                                          add_special_tokens=False).input_ids
+                    logit_bias = []
+                    for (word, bias), tokenized_word_list in zip(word_biases, tokenized_word_lists):
+                        if len(tokenized_word_list) != 1:
                             raise ValueError("You can only bias one token at a time!")
-                        else:
-                            tokenized_word = tokenized_word_list[0]
                         # Replace the string with its token. The string again is only one token at most.
-                        self.settings_object.settings['experimental_settings']['experimental_processors']['logit_bias'][count] = [tokenized_word, bias]
-                        count+=1
+                        logit_bias.append([tokenized_word_list[0], bias])
+                    self.settings['experimental_settings']['experimental_processors']['logit_bias'] = logit_bias
 
 
 
@@ -1,10 +1,6 @@
-import sys
-
-import front_end_utils
 import settings_handler
 import memory_handler
 import requests
-import json
 import base64
 import provider
 
@@ -20,6 +16,11 @@ class Terminal_Provider(provider.Provider):
         :type a_settings_handler: Settings_Handler
         """
         provider.Provider.__init__(self, a_settings_handler)
+        # What the user's messages start with, tokenized just the once as it never changes. Only the rest of each
+        # message gets tokenized as it comes in. The space is left to the message, as that's how it'd be tokenized
+        # as a whole anyways.
+        self.user_prefix = f"{self.user_name}:"
+        self.user_prefix_token_ids = self.memories.tokenize_message(self.user_prefix, self.tokenizer)
     def chat(self):
         """
         Simulates the user I/O between the user and the chatbot using the python terminal.
@@ -32,38 +33,46 @@ class Terminal_Provider(provider.Provider):
         3. If the user doesn't quit immediately, the following is executed:
         4. The typed message is sanitized such that it can be formatted correctly in the chat history and is
            appended to the chat history list.
-        5. The encoded chat history, alongside various other settings are put into the dict serial_settings to be sent
-           in a server response using the json dump string function.
+        5. The encoded chat history is serialized alongside the various other settings, which were serialized ahead of
+           time, to be sent in a server response.
         6. If the response is successful, decode the bot message and detokenize it.
-        7. Print the bot's message and append it to chat history.
+        7. Print the bot's message and append it to chat history. The message is tokenized and the memory is cycled in
+           the background while the user is typing their next message.
         8. Repeat until the user says !quit.
         """
         user_input = ""
+        # None of these change between messages, so they're looked up once here rather than on every message.
+        memories = self.memories
+        tokenizer = self.tokenizer
+        user_prefix = self.user_prefix
+        user_prefix_token_ids = self.user_prefix_token_ids
+        # When the user is prompted for input, it'll look something like such: "Octavius: "
+        user_prompt = f"{self.user_name}: "
         while user_input != "!quit":
-            # When the user is prompted for input, it'll look something like such: "Octavius: "
-            user_input = input(self.user_name + ": ")
+            user_input = input(user_prompt)
             if user_input != "!quit":
                 # overall preparation of settings, including santizing the user's message for the correct conversation
                 # format and the encoding of the chat history.
-                formatted_user_input = self.user_name + ": " + user_input + "\n"
-                self.memories.append_message(formatted_user_input, a_tokenizer=self.tokenizer)
-                chat_history_encoded = self.memories.get_encoded_chat_history(self.tokenizer)
-                self.serial_settings['chat_history'] = chat_history_encoded
-                serial_settings = json.dumps(serial_settings)
+                user_text = f" {user_input}\n"
+                memories.append_message(user_prefix + user_text, a_tokenizer=tokenizer,
+                                        a_token_ids=user_prefix_token_ids + memories.tokenize_message(user_text, tokenizer))
+                chat_history_encoded = memories.get_encoded_chat_history()
+                serial_settings = self.serialize_settings(chat_history_encoded)
 
                 # Send the chat history over to the server
                 bot_response = self.request_generation(serial_settings)
-                # Since this is more of a debugging provider/synchronous, exit immediately on error.
-                if type(bot_response) == int:
-                    sys.exit(-1)
+                # Since this is more of a debugging provider/synchronous, stop chatting immediately on error. The error
+                # itself was already logged by request_generation.
+                if isinstance(bot_response, int):
+                    return
                 # Get rid of the chat history of the bot saying nothing. If we do not do this, the model will not generate
                 # ANYTHING.
                 if bot_response is None:
                     print(f"{self.bot_name}: I didn't know what to say, so I cleared my memories.")
-                    self.memories.clear_all_memories()
+                    memories.clear_all_memories()
                 else:
                     # Decoding and printing of the bot's message. Later it's appended elsewhere.
-                    decoded_bot_message = front_end_utils.decode_encoded_tokenized_tensor(bot_response)
-                    detokenized_bot_message = self.detokenize_decoded_message(decoded_bot_message)
+                    detokenized_bot_message = self.decode_bot_response(bot_response)
                     print(detokenized_bot_message, end="")
-                    self.memories.append_message(detokenized_bot_message, a_tokenizer=self.tokenizer)
+                    # Tokenized and cycled through in the background while the user types their next message.
+                    memories.append_message_in_background(detokenized_bot_message, tokenizer)